@@ -0,0 +1,9 @@
+import os
+
+from dotenv import load_dotenv
+
+# Loads backend/.env into os.environ. Imported once by each entry point (main.py, and migrations.py
+# run as a script) before anything that reads settings; the other modules only read os.environ, so
+# scripts and tests that import them directly get exactly the environment they set up.
+# Variables already set in the environment win over the file.
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
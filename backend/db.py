@@ -1,24 +1,148 @@
+import asyncio
 import os
-from typing import Generator
+import time
+from typing import AsyncGenerator, Generator
 
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import create_engine, Session, SQLModel
-from dotenv import load_dotenv
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-load_dotenv()
+from metrics import instrument_engine, record_pool_wait
+from migrations import pending_migrations, run_migrations
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection pool tuning, shared by the sync and async engines
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30")) # Seconds to wait for a free connection
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", str(DB_POOL_SIZE))) # Connections opened before serving with STARTUP_MODE=production
+
+# The same DATABASE_URL drives both engines; only the driver differs
+SYNC_DRIVERS = {"postgresql": "postgresql", "sqlite": "sqlite"}
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def sync_database_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=SYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+def async_database_url(url: str):
+    url = make_url(url)
+    query = dict(url.query)
+    if url.get_backend_name() == "postgresql":
+        # asyncpg spells libpq's sslmode as ssl and has no channel_binding option
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        query.pop("channel_binding", None)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername), query=query)
+
 # Check if DATABASE_URL is set, otherwise use a default SQLite for development/testing
 if not DATABASE_URL:
     print("DATABASE_URL not found in .env, using SQLite for local development.")
     # For a real project, this should be a proper development database
-    engine = create_engine("sqlite:///./database.db")
-else:
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    DATABASE_URL = "sqlite:///./database.db"
+
+class TimedCheckout:
+    # Pool mixin: reports how long each checkout waited for a connection
+    engine_name = ""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            record_pool_wait(self.engine_name, time.perf_counter() - started)
+
+class TimedQueuePool(TimedCheckout, QueuePool):
+    engine_name = "sync"
+
+class TimedAsyncQueuePool(TimedCheckout, AsyncAdaptedQueuePool):
+    engine_name = "async"
+
+pool_options = dict(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
+engine = create_engine(sync_database_url(DATABASE_URL), poolclass=TimedQueuePool, **pool_options)
+async_engine = create_async_engine(async_database_url(DATABASE_URL), poolclass=TimedAsyncQueuePool, **pool_options)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+# expire_on_commit=False: attributes stay loaded after commit, so async code never triggers an implicit lazy load
+async_session_maker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Full-text search over task titles and descriptions. Postgres indexes this exact expression;
+# queries must repeat it verbatim (constants inlined, not bound) for the planner to use the index.
+TASK_SEARCH_DOCUMENT = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+SQLITE_SEARCH_DDL = [
+    # External-content FTS5 table: stores only the index, rows stay in task
+    "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(title, description, content='task', content_rowid='id', tokenize='porter unicode61')",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_insert AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_delete AFTER DELETE ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_update AFTER UPDATE OF title, description ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+def create_search_index(connection):
+    backend = connection.dialect.name
+    if backend == "sqlite":
+        exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'task_fts'")).first()
+        for statement in SQLITE_SEARCH_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            # Index the rows that were there before the search table
+            connection.execute(text("INSERT INTO task_fts(task_fts) VALUES ('rebuild')"))
+    elif backend == "postgresql":
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_task_search ON task USING GIN ({TASK_SEARCH_DOCUMENT})"))
 
 def create_db_and_tables():
+    with engine.connect() as connection:
+        fresh = not inspect(connection).has_table("task")
     SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # Bring existing tables up to the models before indexing them
+        for version in run_migrations(connection, fresh=fresh):
+            if not fresh:
+                print(f"Applied migration {version}")
+    # create_all skips tables that already exist, so add indexes declared since they were created
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        create_search_index(connection)
+
+async def check_schema():
+    # Production startup runs no DDL: the release step (python migrations.py) must have migrated already
+    async with async_engine.connect() as connection:
+        pending = await connection.run_sync(pending_migrations)
+    if pending:
+        raise RuntimeError(f"Database schema is behind (pending migrations {pending}); run python migrations.py first")
+
+async def warm_pool(size: int = DB_POOL_WARM):
+    # Opens the connections concurrently and returns them to the pool, so the first requests after a
+    # cold start don't each pay for a connect (and, on hosted Postgres, a TLS handshake)
+    async def open_connection():
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(open_connection() for _ in range(min(size, DB_POOL_SIZE))))
+
+def dialect_insert(session, model):
+    # INSERT with ON CONFLICT support; Postgres and SQLite share the on_conflict_do_* API
+    dialect = postgresql if session.bind.dialect.name == "postgresql" else sqlite
+    return dialect.insert(model)
 
 def get_session() -> Generator[Session, None, None]:
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with async_session_maker() as session:
+        yield session
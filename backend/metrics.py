@@ -0,0 +1,250 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+# Process-local metrics, served in the Prometheus text format at GET /metrics
+METRICS_PROFILING = os.getenv("METRICS_PROFILING", "1") == "1" # Honour X-Profile: 1 with a Server-Timing header
+PROFILE_HEADER = b"x-profile"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "CREATE", "ALTER", "PRAGMA"}
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def quote(value: str) -> str:
+    return f'"{escape(value)}"'
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f"{name}={quote(value)}" for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{format_labels(self.labels, key)} {value:g}"
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values: Dict[Tuple[str, ...], List] = {} # key -> [per-bucket counts, sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{format_labels(self.labels, key, 'le=%s' % quote(f'{bound:g}'))} {cumulative}"
+            yield f"{self.name}_bucket{format_labels(self.labels, key, 'le=%s' % quote('+Inf'))} {count}"
+            yield f"{self.name}_sum{format_labels(self.labels, key)} {total:g}"
+            yield f"{self.name}_count{format_labels(self.labels, key)} {count}"
+
+class Gauge:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            self.values[key] = value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{format_labels(self.labels, key)} {value:g}"
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Time from request to the last byte of the response.", ["method", "route", "status"]
+)
+db_statements = Counter("db_statements_total", "SQL statements executed.", ["operation"])
+db_statement_seconds = Histogram("db_statement_duration_seconds", "Time spent executing SQL statements.", ["operation"], SQL_BUCKETS)
+db_pool_wait_seconds = Histogram(
+    "db_pool_checkout_seconds", "Time to get a connection from the pool, including opening a new one.", ["engine"], SQL_BUCKETS
+)
+llm_request_seconds = Histogram("llm_request_duration_seconds", "Model call latency.", ["kind", "round"])
+llm_tokens = Counter("llm_tokens_total", "Tokens reported by the model API.", ["kind", "round", "type"])
+startup_seconds = Gauge("app_startup_seconds", "Time this process spent in each startup phase.", ["phase"])
+job_runs = Counter("jobs_total", "Background job runs by outcome: succeeded, retried or failed.", ["kind", "outcome"])
+job_seconds = Histogram("job_duration_seconds", "Time to run a background job, including its commit.", ["kind"])
+
+METRICS = [
+    http_request_seconds, db_statements, db_statement_seconds, db_pool_wait_seconds, llm_request_seconds, llm_tokens,
+    startup_seconds, job_runs, job_seconds,
+]
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+# --- Startup ---
+
+# Phase name -> seconds, in the order the phases ran
+startup_phases: Dict[str, float] = {}
+
+def record_startup_phase(phase: str, seconds: float):
+    startup_phases[phase] = seconds
+    startup_seconds.set(seconds, phase=phase)
+
+@contextmanager
+def startup_phase(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_startup_phase(phase, time.perf_counter() - started)
+
+def startup_report() -> str:
+    # One line for the boot log, e.g. "import 820ms, schema_check 12ms, pool_warm 95ms (total 927ms)"
+    parts = [f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in startup_phases.items()]
+    return ", ".join(parts) + f" (total {sum(startup_phases.values()) * 1000:.0f}ms)"
+
+# --- Per-request profile ---
+
+class RequestProfile:
+    # Totals for one request, reported in a Server-Timing header when the client sends X-Profile: 1
+    def __init__(self):
+        self.db_statements = 0
+        self.db_seconds = 0.0
+        self.pool_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self.llm_tokens = 0
+
+    def server_timing(self, total_seconds: float) -> str:
+        return ", ".join([
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.db_statements} queries"',
+            f"pool;dur={self.pool_seconds * 1000:.2f}",
+            f'llm;dur={self.llm_seconds * 1000:.2f};desc="{self.llm_calls} calls, {self.llm_tokens} tokens"',
+            f"total;dur={total_seconds * 1000:.2f}",
+        ])
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+# --- Hooks ---
+
+def instrument_engine(engine):
+    # Statement counts and durations; takes a sync Engine (use async_engine.sync_engine for the async one)
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.metrics_started
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        operation = operation if operation in SQL_OPERATIONS else "OTHER"
+        db_statements.inc(operation=operation)
+        db_statement_seconds.observe(elapsed, operation=operation)
+        profile = current_profile.get()
+        if profile is not None:
+            profile.db_statements += 1
+            profile.db_seconds += elapsed
+
+def record_pool_wait(engine_name: str, seconds: float):
+    db_pool_wait_seconds.observe(seconds, engine=engine_name)
+    profile = current_profile.get()
+    if profile is not None:
+        profile.pool_seconds += seconds
+
+def record_llm_call(kind: str, round_number: Optional[int], seconds: float, usage=None):
+    # usage is the API's usage object (prompt_tokens/completion_tokens), or None if it didn't report one
+    round_label = "" if round_number is None else str(round_number)
+    llm_request_seconds.observe(seconds, kind=kind, round=round_label)
+    tokens = 0
+    if usage is not None:
+        llm_tokens.inc(usage.prompt_tokens, kind=kind, round=round_label, type="prompt")
+        llm_tokens.inc(usage.completion_tokens, kind=kind, round=round_label, type="completion")
+        tokens = usage.prompt_tokens + usage.completion_tokens
+    profile = current_profile.get()
+    if profile is not None:
+        profile.llm_calls += 1
+        profile.llm_seconds += seconds
+        profile.llm_tokens += tokens
+
+def record_job_run(kind: str, outcome: str, seconds: float):
+    job_runs.inc(kind=kind, outcome=outcome)
+    job_seconds.observe(seconds, kind=kind)
+
+def route_template(scope) -> str:
+    # "/api/tasks/42" -> "/api/tasks/{task_id}", from the path parameters routing filled in.
+    # Built from the path rather than the route object, whose path may lack the router prefix.
+    if "route" not in scope:
+        return "unmatched"
+    names = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join(f"{{{names[part]}}}" if part in names else part for part in scope["path"].split("/"))
+
+class MetricsMiddleware:
+    """
+    Records http_request_duration_seconds by route template (not raw path, which would give
+    one series per task id) and sets up the per-request profile. Timing runs to the last body
+    chunk, so streamed responses count in full; Server-Timing goes out with the headers and
+    only covers the work done before them.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        wants_profile = METRICS_PROFILING and dict(scope["headers"]).get(PROFILE_HEADER) == b"1"
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if wants_profile:
+                    timing = profile.server_timing(time.perf_counter() - started)
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            http_request_seconds.observe(
+                time.perf_counter() - started, method=scope["method"], route=route_template(scope), status=status
+            )
@@ -0,0 +1,111 @@
+import sys
+from typing import Callable, List, Tuple
+
+from sqlalchemy import DateTime, inspect, text
+
+from models import Job # Also registers every table with SQLModel.metadata, for create_all
+
+# Versioned, in-place changes to existing databases. create_all only adds missing tables (and
+# create_db_and_tables missing indexes); it never changes a column, so anything that does lives
+# here. Each migration runs once, in order, in the transaction that records it in schema_version.
+# With STARTUP_MODE=production the app only checks the version, so run this module as the release
+# step: python migrations.py (or --check to list pending versions without applying them).
+
+SCHEMA_VERSION_DDL = """CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+)"""
+MIGRATION_LOCK_ID = 7_340_001 # Postgres advisory lock, so concurrent workers migrate one at a time
+
+# --- 1: native timestamps ---
+
+# Columns that used to hold ISO 8601 strings
+TIMESTAMP_COLUMNS = {
+    "user": ["created_at"],
+    "task": ["created_at", "updated_at"],
+    "conversation": ["created_at", "updated_at"],
+    "message": ["created_at"],
+    "conversationsummary": ["updated_at"],
+}
+
+# SQLite has no timestamp type: SQLAlchemy stores "YYYY-MM-DD HH:MM:SS.ffffff" text in UTC, which
+# sorts and compares correctly as long as every row uses it. Old rows hold isoformat() output;
+# the common "...ffffff+00:00" shape is cut down exactly, anything else goes through strftime
+# (UTC, millisecond precision).
+SQLITE_TIMESTAMP_BACKFILL = """UPDATE {table} SET {column} = CASE
+    WHEN length({column}) = 32 AND substr({column}, 27) = '+00:00' THEN replace(substr({column}, 1, 26), 'T', ' ')
+    ELSE strftime('%Y-%m-%d %H:%M:%f', {column})
+END
+WHERE {column} LIKE '%T%'"""
+
+def native_timestamps(connection):
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table_name, columns in TIMESTAMP_COLUMNS.items():
+        if not inspector.has_table(table_name):
+            continue
+        table = preparer.quote(table_name)
+        if connection.dialect.name == "postgresql":
+            types = {column["name"]: column["type"] for column in inspector.get_columns(table_name)}
+            pending = [name for name in columns if not isinstance(types[name], DateTime)]
+            if pending:
+                connection.execute(text(f"ALTER TABLE {table} " + ", ".join(
+                    f"ALTER COLUMN {name} TYPE TIMESTAMP WITH TIME ZONE USING {name}::timestamptz" for name in pending
+                )))
+        elif connection.dialect.name == "sqlite":
+            for name in columns:
+                connection.execute(text(SQLITE_TIMESTAMP_BACKFILL.format(table=table, column=name)))
+
+# --- 2: job table ---
+
+def job_table(connection):
+    # create_db_and_tables adds it too; the version is what STARTUP_MODE=production checks for
+    Job.__table__.create(connection, checkfirst=True)
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "native timestamp columns", native_timestamps),
+    (2, "job table", job_table),
+]
+
+def run_migrations(connection, fresh: bool = False) -> List[int]:
+    """
+    Applies pending migrations and returns the versions applied. On a fresh database the tables
+    were just created from the current models, so migrations are recorded without running.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+    connection.execute(text(SCHEMA_VERSION_DDL))
+    applied = set(connection.execute(text("SELECT version FROM schema_version")).scalars())
+    ran = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        if not fresh:
+            migrate(connection)
+        connection.execute(text("INSERT INTO schema_version (version, name) VALUES (:version, :name)"), {"version": version, "name": name})
+        ran.append(version)
+    return ran
+
+def pending_migrations(connection) -> List[int]:
+    # Read-only: the versions run_migrations would apply. A never-migrated database has all of them pending.
+    if not inspect(connection).has_table("schema_version"):
+        return [version for version, _, _ in MIGRATIONS]
+    applied = set(connection.execute(text("SELECT version FROM schema_version")).scalars())
+    return [version for version, _, _ in MIGRATIONS if version not in applied]
+
+def main(argv: List[str]) -> int:
+    import config # Loads .env, as main.py does, before db reads DATABASE_URL
+    from db import create_db_and_tables, engine
+
+    if "--check" in argv:
+        with engine.connect() as connection:
+            pending = pending_migrations(connection)
+        print(f"Pending migrations: {pending}" if pending else "Schema is up to date")
+        return 1 if pending else 0
+    create_db_and_tables()
+    print(f"Schema is at version {MIGRATIONS[-1][0]}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
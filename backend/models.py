@@ -1,12 +1,35 @@
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime, timezone 
+from sqlalchemy import JSON, DateTime, Index
+from sqlalchemy.types import TypeDecorator
 from sqlmodel import Field, SQLModel, Relationship
 
+class UTCDateTime(TypeDecorator):
+    # Timestamps go in and come out as aware UTC datetimes on every backend. Postgres stores
+    # timestamptz; SQLite has no zone support, so values are stored as UTC and tagged on the way out.
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc) # Naive input is taken to be UTC
+        return value.astimezone(timezone.utc)
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
 class User(SQLModel, table=True):
     id: Optional[str] = Field(default=None, primary_key=True)
     email: str = Field(unique=True, index=True)
     name: Optional[str] = None
-    created_at: Optional[str] = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat(), nullable=False)
+    created_at: datetime = Field(default_factory=utc_now, sa_type=UTCDateTime, nullable=False)
     
     conversations: List["Conversation"] = Relationship(back_populates="user")
 
@@ -15,33 +38,101 @@ class TaskBase(SQLModel):
     description: Optional[str] = None
 
 class Task(TaskBase, table=True):
+    __table_args__ = (
+        # Matches the list query: filter by user (and status), then page by id
+        Index("ix_task_user_id_completed_id", "user_id", "completed", "id"),
+        # "Updated since T" sync queries
+        Index("ix_task_user_id_updated_at", "user_id", "updated_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(index=True)
     completed: bool = Field(default=False)
-    created_at: Optional[str] = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat(), nullable=False)
-    updated_at: Optional[str] = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat(), nullable=False)
+    created_at: datetime = Field(default_factory=utc_now, sa_type=UTCDateTime, nullable=False)
+    updated_at: datetime = Field(default_factory=utc_now, sa_type=UTCDateTime, nullable=False)
 
 class TaskCreate(TaskBase):
     pass
 
 class TaskRead(TaskBase):
+    # What task reads return; the owner is implied by the request, so user_id is left out
     id: int
     completed: bool
+    created_at: datetime
+    updated_at: datetime
+
+# Bulk operation payloads; each item gets its own entry in the response
+class TaskBulkUpdate(SQLModel):
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    completed: Optional[bool] = None
+
+class TaskBulkComplete(SQLModel):
+    ids: List[int]
+    completed: bool = True
+
+class TaskBulkDelete(SQLModel):
+    ids: List[int]
 
 class Conversation(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="user.id")
-    created_at: Optional[str] = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat(), nullable=False)
-    updated_at: Optional[str] = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat(), nullable=False)
+    created_at: datetime = Field(default_factory=utc_now, sa_type=UTCDateTime, nullable=False)
+    updated_at: datetime = Field(default_factory=utc_now, sa_type=UTCDateTime, nullable=False)
     
     user: User = Relationship(back_populates="conversations")
     messages: List["Message"] = Relationship(back_populates="conversation")
 
 class Message(SQLModel, table=True):
+    # History is read per conversation, in id order or by time
+    __table_args__ = (
+        Index("ix_message_conversation_id_id", "conversation_id", "id"),
+        Index("ix_message_conversation_id_created_at", "conversation_id", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     conversation_id: int = Field(foreign_key="conversation.id")
     role: str # "user" or "assistant"
     content: str
-    created_at: Optional[str] = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat(), nullable=False)
+    created_at: datetime = Field(default_factory=utc_now, sa_type=UTCDateTime, nullable=False)
+
+    conversation: Conversation = Relationship(back_populates="messages")
+
+class ConversationSummary(SQLModel, table=True):
+    # Running summary of the turns that have dropped out of the chat context window
+    conversation_id: int = Field(foreign_key="conversation.id", primary_key=True)
+    summary: str = ""
+    through_message_id: int = 0 # Last message folded into the summary
+    updated_at: datetime = Field(default_factory=utc_now, sa_type=UTCDateTime, nullable=False)
+
+class Job(SQLModel, table=True):
+    # Background work (services/jobs.py). Workers claim queued jobs whose run_at has passed, oldest first.
+    __table_args__ = (Index("ix_job_status_run_at", "status", "run_at"),)
 
-    conversation: Conversation = Relationship(back_populates="messages")
\ No newline at end of file
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: str = Field(index=True)
+    kind: str # Names the handler that runs it
+    payload: Dict[str, Any] = Field(default_factory=dict, sa_type=JSON)
+    status: str = "queued" # "queued", "running", "succeeded" or "failed"
+    attempts: int = 0
+    max_attempts: int = 5
+    run_at: datetime = Field(default_factory=utc_now, sa_type=UTCDateTime, nullable=False) # Not before; pushed back on retry
+    locked_until: Optional[datetime] = Field(default=None, sa_type=UTCDateTime) # Lease of the worker running it
+    result: Optional[Dict[str, Any]] = Field(default=None, sa_type=JSON)
+    error: Optional[str] = None # Last failure, kept while retrying
+    created_at: datetime = Field(default_factory=utc_now, sa_type=UTCDateTime, nullable=False)
+    updated_at: datetime = Field(default_factory=utc_now, sa_type=UTCDateTime, nullable=False)
+
+class JobRead(SQLModel):
+    # What status polling returns; the payload stays server-side
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,45 @@
+import json
+from datetime import date, datetime
+from typing import Any, AsyncIterable, AsyncIterator, Iterable
+
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import orjson # Optional: several times faster than json for task lists
+except ImportError:
+    orjson = None
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+class FastJSONResponse(Response):
+    """
+    JSON response for content that is already plain dicts/lists (rows from services/tasks.py).
+    Returning it from a route skips response_model validation and jsonable_encoder entirely.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+async def json_array_chunks(batches: AsyncIterable[Iterable[Any]]) -> AsyncIterator[bytes]:
+    # Encodes a JSON array one batch at a time, so memory stays flat however many rows there are
+    yield b"["
+    first = True
+    async for batch in batches:
+        encoded = dumps(list(batch))[1:-1] # One encoder call per batch, minus its brackets
+        if not encoded:
+            continue
+        yield encoded if first else b"," + encoded
+        first = False
+    yield b"]"
+
+def streaming_json_array(batches: AsyncIterable[Iterable[Any]], **kwargs) -> StreamingResponse:
+    return StreamingResponse(json_array_chunks(batches), media_type="application/json", **kwargs)
@@ -1,9 +1,20 @@
-from fastapi import APIRouter, Depends
+import json
+import os
+from typing import Dict, Set, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlmodel import Session, select
-from ..db import get_session
-from ..models import Conversation, Message, User
-from ..services.ai import get_ai_response # Import the AI response function
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from db import async_session_maker, dialect_insert, get_async_session
+from models import Conversation, Message, User, utc_now
+from services.ai import AIError, AITimeoutError, get_ai_response, stream_ai_response # Import the AI response functions
+from services.context import ConversationContext, load_conversation_context, save_summary
+
+# Users known to exist, so most chat turns skip the user check. Per process; users are never deleted.
+KNOWN_USERS_MAX = int(os.getenv("KNOWN_USERS_MAX", "10000"))
+known_users: Set[str] = set()
 
 class ChatRequest(BaseModel):
     message: str
@@ -15,52 +26,120 @@ class ChatResponse(BaseModel):
 
 router = APIRouter()
 
-@router.post("/chat/", response_model=ChatResponse)
-async def handle_chat(chat_request: ChatRequest, session: Session = Depends(get_session)):
-    user_id = "test_user" # Hardcoded user_id for now
+# A chat turn touches the database in two short transactions, one on each side of the model
+# call. Nothing is held open while the model generates: commit returns the connection to the
+# pool, and the session only takes one again for tool calls or the final write.
+
+async def ensure_user(session: AsyncSession, user_id: str):
+    if user_id in known_users:
+        return
+    # One statement whether or not the user exists, and safe against a concurrent first request
+    await session.execute(
+        dialect_insert(session, User)
+        .values(id=user_id, email=f"{user_id}@example.com", name=user_id, created_at=utc_now())
+        .on_conflict_do_nothing()
+    )
 
-    # Ensure user exists (for conversation linking)
-    user = session.exec(select(User).where(User.id == user_id)).first()
-    if not user:
-        user = User(id=user_id, email=f"{user_id}@example.com", name=user_id)
-        session.add(user)
-        session.commit()
-        session.refresh(user)
+async def prepare_conversation(chat_request: ChatRequest, session: AsyncSession, user_id: str) -> Tuple[int, ConversationContext]:
+    # Pre-LLM transaction: user, conversation, history and the new user message, one commit
+    await ensure_user(session, user_id)
 
-    # Find or create conversation
-    conversation = None
+    conversation_id = None
     if chat_request.conversation_id:
-        conversation = session.exec(select(Conversation).where(Conversation.id == chat_request.conversation_id, Conversation.user_id == user_id)).first()
-    
-    if not conversation:
+        conversation_id = (await session.exec(
+            select(Conversation.id).where(Conversation.id == chat_request.conversation_id, Conversation.user_id == user_id)
+        )).first()
+
+    if conversation_id is None:
         conversation = Conversation(user_id=user_id)
         session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
-    
-    # Store user message
-    user_message_obj = Message(conversation_id=conversation.id, role="user", content=chat_request.message)
-    session.add(user_message_obj)
-    session.commit()
-    session.refresh(user_message_obj)
-
-    # Get conversation history
-    conversation_messages = session.exec(select(Message).where(Message.conversation_id == conversation.id).order_by(Message.created_at)).all()
-    # Format messages for OpenAI
-    formatted_messages = [{"role": msg.role, "content": msg.content} for msg in conversation_messages]
+        await session.flush() # INSERT ... RETURNING fills in the id
+        conversation_id = conversation.id
+        context = ConversationContext(conversation_id) # Nothing to load yet
+    else:
+        # Summary plus recent window of earlier turns. Loaded before the new message is stored,
+        # since get_ai_response appends the user message itself.
+        context = await load_conversation_context(session, conversation_id)
+
+    session.add(Message(conversation_id=conversation_id, role="user", content=chat_request.message))
+    await session.commit()
+
+    if len(known_users) >= KNOWN_USERS_MAX:
+        known_users.clear()
+    known_users.add(user_id)
+    return conversation_id, context
+
+async def store_reply(session: AsyncSession, context: ConversationContext, content: str):
+    # Post-LLM transaction: the assistant message and any newly folded summary, one commit
+    session.add(Message(conversation_id=context.conversation_id, role="assistant", content=content))
+    await save_summary(session, context)
+    await session.commit()
+
+def format_sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/chat/", response_model=ChatResponse)
+async def handle_chat(chat_request: ChatRequest, session: AsyncSession = Depends(get_async_session)):
+    user_id = "test_user" # Hardcoded user_id for now
+    conversation_id, context = await prepare_conversation(chat_request, session, user_id)
 
     # Get AI response
-    ai_response_content = await get_ai_response(
-        user_message=chat_request.message,
-        conversation_messages=formatted_messages,
-        session=session,
-        user_id=user_id # Pass user_id to AI tools
-    )
+    try:
+        await context.fold()
+        ai_response_content = await get_ai_response(
+            user_message=chat_request.message,
+            conversation_messages=context.messages(),
+            session=session, # Write tools commit their own short transactions
+            user_id=user_id # Pass user_id to AI tools
+        )
+    except AITimeoutError:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="AI response timed out")
+    except AIError:
+        # E.g. a missing or rejected OPENAI_API_KEY, which the lazily built client only finds out now
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="AI response failed")
 
-    # Store AI response
-    ai_message_obj = Message(conversation_id=conversation.id, role="assistant", content=ai_response_content)
-    session.add(ai_message_obj)
-    session.commit()
-    session.refresh(ai_message_obj)
+    await store_reply(session, context, ai_response_content)
+    return ChatResponse(response=ai_response_content, conversation_id=conversation_id)
 
-    return ChatResponse(response=ai_response_content, conversation_id=conversation.id)
\ No newline at end of file
+@router.post("/chat/stream")
+async def stream_chat(chat_request: ChatRequest, session: AsyncSession = Depends(get_async_session)):
+    """
+    Server-sent events variant of /chat/. Emits `token`, `tool_call` and `tool_result`
+    events while the model runs, then `done` with the conversation ID once the
+    assistant message has been stored (or `error` if the model call failed).
+    """
+    user_id = "test_user" # Hardcoded user_id for now
+    conversation_id, context = await prepare_conversation(chat_request, session, user_id)
+
+    async def event_stream():
+        # The request-scoped session may be closed before the body finishes streaming,
+        # so tools and the final message use a session owned by the stream.
+        async with async_session_maker() as stream_session:
+            content = []
+            try:
+                await context.fold()
+                async for event in stream_ai_response(
+                    user_message=chat_request.message,
+                    conversation_messages=context.messages(),
+                    session=stream_session,
+                    user_id=user_id,
+                ):
+                    if event["type"] == "token":
+                        content.append(event["content"])
+                    elif event["type"] == "tool_call":
+                        # Text before a tool call isn't the answer; /chat/ stores the last round's only
+                        content = []
+                    yield format_sse(event["type"], event)
+            except AIError:
+                yield format_sse("error", {"type": "error", "detail": "AI response failed"})
+                return
+
+            ai_response_content = "".join(content)
+            await store_reply(stream_session, context, ai_response_content)
+            yield format_sse("done", {"type": "done", "response": ai_response_content, "conversation_id": conversation_id})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
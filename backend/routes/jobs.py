@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+from db import get_async_session
+from models import JobRead
+from responses import FastJSONResponse
+from services.jobs import get_job_row
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}", response_model=JobRead)
+async def read_job(job_id: int, session: AsyncSession = Depends(get_async_session), user_id: str = "test_user"):
+    # Status polling for work queued by POST /api/tasks/import or by chat with AI_BACKGROUND_WRITES.
+    # "queued" jobs may already have failed attempts (see error); "succeeded" and "failed" are final.
+    job = await get_job_row(session, user_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(job)
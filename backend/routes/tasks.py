@@ -1,76 +1,266 @@
+import asyncio
+import hashlib
+from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from db import get_session
-from models import Task, TaskCreate
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from db import async_session_maker, get_async_session
+from models import Task, TaskBulkComplete, TaskBulkDelete, TaskBulkUpdate, TaskCreate, TaskRead
+from responses import FastJSONResponse, dumps, streaming_json_array
+from services.tasks import (
+    BULK_MAX_ITEMS, bulk_complete_tasks, bulk_create_tasks, bulk_delete_tasks, bulk_update_tasks, cached_task,
+    cached_search, cached_tasks_page, create_task_row, delete_task_row, list_tasks_page, parse_fields, publish_task_changes,
+    update_task_row,
+)
+from services.cache import task_cache
+from services.feed import task_feed
+from services.jobs import TASK_IMPORT_MAX_ITEMS, enqueue_job, job_pool
 
 router = APIRouter()
 
+# Routes return rows from services/tasks.py as FastJSONResponse: they are plain dicts already,
+# so response_model is only there for the OpenAPI schema and is never validated against.
+REVALIDATE = "private, no-cache" # Clients may cache, but must revalidate with If-None-Match
+EXPORT_BATCH_SIZE = 1000
+
+def task_etag(version: str, *parts) -> str:
+    # Strong ETag: same user version and same request parameters means byte-identical JSON
+    digest = hashlib.sha1("|".join(map(str, (version, *parts))).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return etag in (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": REVALIDATE})
+
+def check_batch_size(items: List):
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {BULK_MAX_ITEMS} items per request.")
+
 @router.post("/tasks/", response_model=Task, status_code=status.HTTP_201_CREATED)
-async def create_task(task_data: TaskCreate, session: Session = Depends(get_session)):
-    # Create a new Task instance from the TaskCreate data
-    task = Task.from_orm(task_data)
-    task.user_id = "test_user" # Placeholder until Better Auth is integrated
-    session.add(task)
-    session.commit()
-    session.refresh(task)
-    return task
-
-@router.get("/tasks/", response_model=List[Task])
+async def create_task(task_data: TaskCreate, session: AsyncSession = Depends(get_async_session)):
+    # INSERT ... RETURNING gives back the stored row, so there's no refresh afterwards
+    user_id = "test_user" # Placeholder until Better Auth is integrated
+    task = await create_task_row(session, user_id, task_data.title, task_data.description)
+    await session.commit()
+    await publish_task_changes(session)
+    return FastJSONResponse(task, status_code=status.HTTP_201_CREATED)
+
+@router.get("/tasks/", response_model=List[TaskRead])
 async def read_tasks(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     status_filter: Optional[str] = None, # "all", "pending", "completed"
-    user_id: str = "test_user" # Placeholder for authenticated user
+    user_id: str = "test_user", # Placeholder for authenticated user
+    cursor: Optional[str] = None, # X-Next-Cursor from the previous page
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = None, # Comma-separated columns to return, e.g. "id,title,completed"
+    updated_since: Optional[datetime] = None, # Only tasks created or changed after this time (ISO 8601, UTC if no offset)
+    if_none_match: Optional[str] = Header(None),
+):
+    # The version is read before the rows: if a write lands in between, the client gets newer
+    # rows under an older ETag and simply refetches next time, never the other way round
+    etag = task_etag(await task_cache.version(user_id), user_id, status_filter or "all", cursor, limit, fields, updated_since)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    try:
+        tasks, next_cursor = await cached_tasks_page(
+            session, user_id, status_filter=status_filter, cursor=cursor, limit=limit, fields=parse_fields(fields),
+            updated_since=updated_since,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return FastJSONResponse(tasks, headers=headers)
+
+@router.get("/tasks/export", response_model=List[TaskRead])
+async def export_tasks(
+    status_filter: Optional[str] = None, # "all", "pending", "completed"
+    user_id: str = "test_user", # Placeholder for authenticated user
+    fields: Optional[str] = None, # Comma-separated columns to return, e.g. "id,title,completed"
+    updated_since: Optional[datetime] = None, # Only tasks created or changed after this time (ISO 8601, UTC if no offset)
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Every matching task as one JSON array, streamed in keyset-paged batches so neither the
+    server nor the database holds the whole list at once.
+    For incremental sync, pass the largest updated_at the client has seen as updated_since.
+    """
+    etag = task_etag(await task_cache.version(user_id), user_id, "export", status_filter or "all", fields, updated_since)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    try:
+        names = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def batches():
+        # The request-scoped session may close before the body is sent, so the stream owns its own
+        async with async_session_maker() as session:
+            cursor = None
+            while True:
+                tasks, cursor = await list_tasks_page(
+                    session, user_id, status_filter, cursor, EXPORT_BATCH_SIZE, names, updated_since
+                )
+                yield tasks
+                if not cursor:
+                    break
+
+    return streaming_json_array(batches(), headers={"ETag": etag, "Cache-Control": REVALIDATE})
+
+@router.get("/tasks/search", response_model=List[TaskRead])
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    session: AsyncSession = Depends(get_async_session),
+    status_filter: Optional[str] = None, # "all", "pending", "completed"
+    user_id: str = "test_user", # Placeholder for authenticated user
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = None, # Comma-separated columns to return, e.g. "id,title,completed"
+):
+    # Ranked full-text matches, best first
+    try:
+        names = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(await cached_search(session, user_id, q, status_filter=status_filter, limit=limit, fields=names))
+
+# Bulk endpoints: one transaction per request, one result per item in request order.
+# Items whose id matches no task for this user come back as {"id": ..., "status": "not_found"}.
+
+@router.post("/tasks/bulk", status_code=status.HTTP_201_CREATED)
+async def bulk_create(tasks: List[TaskCreate], session: AsyncSession = Depends(get_async_session), user_id: str = "test_user"):
+    check_batch_size(tasks)
+    results = await bulk_create_tasks(session, user_id, [task.dict() for task in tasks])
+    await session.commit()
+    await publish_task_changes(session)
+    return FastJSONResponse(results, status_code=status.HTTP_201_CREATED)
+
+@router.post("/tasks/import", status_code=status.HTTP_202_ACCEPTED)
+async def import_tasks(tasks: List[TaskCreate], session: AsyncSession = Depends(get_async_session), user_id: str = "test_user"):
+    # Imports too large for /tasks/bulk run as a background job, committed in batches; poll Location for progress and the outcome
+    if len(tasks) > TASK_IMPORT_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {TASK_IMPORT_MAX_ITEMS} items per import.")
+    job = await enqueue_job(session, user_id, "task_import", {"tasks": [task.dict() for task in tasks]})
+    await session.commit()
+    job_pool.wake()
+    return FastJSONResponse(
+        {"job_id": job["id"], "status": job["status"], "items": len(tasks)},
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": f"/api/jobs/{job['id']}"},
+    )
+
+@router.patch("/tasks/bulk")
+async def bulk_update(updates: List[TaskBulkUpdate], session: AsyncSession = Depends(get_async_session), user_id: str = "test_user"):
+    check_batch_size(updates)
+    results = await bulk_update_tasks(session, user_id, [update.dict(exclude_unset=True) for update in updates])
+    await session.commit()
+    await publish_task_changes(session)
+    return FastJSONResponse(results)
+
+@router.post("/tasks/bulk/complete")
+async def bulk_complete(request: TaskBulkComplete, session: AsyncSession = Depends(get_async_session), user_id: str = "test_user"):
+    check_batch_size(request.ids)
+    results = await bulk_complete_tasks(session, user_id, request.ids, request.completed)
+    await session.commit()
+    await publish_task_changes(session)
+    return FastJSONResponse(results)
+
+@router.post("/tasks/bulk/delete")
+async def bulk_delete(request: TaskBulkDelete, session: AsyncSession = Depends(get_async_session), user_id: str = "test_user"):
+    check_batch_size(request.ids)
+    results = await bulk_delete_tasks(session, user_id, request.ids)
+    await session.commit()
+    await publish_task_changes(session)
+    return FastJSONResponse(results)
+
+@router.get("/tasks/{task_id}", response_model=TaskRead)
+async def read_task(
+    task_id: int,
+    session: AsyncSession = Depends(get_async_session),
+    user_id: str = "test_user",
+    if_none_match: Optional[str] = Header(None),
 ):
-    query = select(Task).where(Task.user_id == user_id)
-    if status_filter == "pending":
-        query = query.where(Task.completed == False)
-    elif status_filter == "completed":
-        query = query.where(Task.completed == True)
-    
-    tasks = session.exec(query).all()
-    return tasks
-
-@router.get("/tasks/{task_id}", response_model=Task)
-async def read_task(task_id: int, session: Session = Depends(get_session), user_id: str = "test_user"):
-    task = session.exec(select(Task).where(Task.id == task_id, Task.user_id == user_id)).first()
+    etag = task_etag(await task_cache.version(user_id), user_id, task_id)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    task = await cached_task(session, user_id, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    return FastJSONResponse(task, headers={"ETag": etag, "Cache-Control": REVALIDATE})
 
 @router.put("/tasks/{task_id}", response_model=Task)
-async def update_task(task_id: int, task_update: TaskCreate, session: Session = Depends(get_session), user_id: str = "test_user"):
-    task = session.exec(select(Task).where(Task.id == task_id, Task.user_id == user_id)).first()
+async def update_task(task_id: int, task_update: TaskCreate, session: AsyncSession = Depends(get_async_session), user_id: str = "test_user"):
+    # Update only provided fields
+    task = await update_task_row(session, user_id, task_id, **task_update.dict(exclude_unset=True))
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Update only provided fields
-    task_data = task_update.dict(exclude_unset=True)
-    for key, value in task_data.items():
-        setattr(task, key, value)
-    
-    session.add(task)
-    session.commit()
-    session.refresh(task)
-    return task
+    await session.commit()
+    await publish_task_changes(session)
+    return FastJSONResponse(task)
 
 @router.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_task(task_id: int, session: Session = Depends(get_session), user_id: str = "test_user"):
-    task = session.exec(select(Task).where(Task.id == task_id, Task.user_id == user_id)).first()
-    if not task:
+async def delete_task(task_id: int, session: AsyncSession = Depends(get_async_session), user_id: str = "test_user"):
+    if not await delete_task_row(session, user_id, task_id):
         raise HTTPException(status_code=404, detail="Task not found")
-    session.delete(task)
-    session.commit()
+    await session.commit()
+    await publish_task_changes(session)
     return
 
 @router.patch("/tasks/{task_id}/complete", response_model=Task)
-async def complete_task(task_id: int, session: Session = Depends(get_session), user_id: str = "test_user"):
-    task = session.exec(select(Task).where(Task.id == task_id, Task.user_id == user_id)).first()
+async def complete_task(task_id: int, session: AsyncSession = Depends(get_async_session), user_id: str = "test_user"):
+    task = await update_task_row(session, user_id, task_id, completed=True)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    task.completed = True
-    session.add(task)
-    session.commit()
-    session.refresh(task)
-    return task
\ No newline at end of file
+    await session.commit()
+    await publish_task_changes(session)
+    return FastJSONResponse(task)
+
+@router.websocket("/tasks/feed")
+async def task_feed_socket(
+    websocket: WebSocket,
+    user_id: str = "test_user", # Placeholder for authenticated user
+    since: Optional[int] = None, # Last seq the client applied, to resume after a reconnect
+    epoch: Optional[str] = None, # Epoch from the hello message of the earlier connection
+):
+    """
+    Live task changes for one user. The server first sends {"type": "hello", "epoch", "seq"},
+    then {"type": "change", "seq", "op": "created" | "updated", "task"} or
+    {"type": "change", "seq", "op": "deleted", "id"} as changes commit. A {"type": "reset"}
+    means changes were missed (no or stale resume point, or the client fell too far behind):
+    reload the list with GET /api/tasks/ and carry on applying changes.
+    """
+    await websocket.accept()
+    subscription = task_feed.subscribe(user_id, since, epoch)
+
+    async def send_events():
+        async for event in subscription:
+            await websocket.send_text(dumps(event).decode()) # Task rows carry datetimes, which send_json can't encode
+
+    async def wait_for_disconnect():
+        # Clients don't send anything; reading is only how we learn the socket closed
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    try:
+        await websocket.send_json({"type": "hello", "epoch": task_feed.epoch, "seq": subscription.last_seq})
+        sender = asyncio.create_task(send_events())
+        receiver = asyncio.create_task(wait_for_disconnect())
+        done, pending = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*done) # Re-raise anything the finished side failed with
+    except WebSocketDisconnect:
+        pass
+    finally:
+        task_feed.unsubscribe(user_id, subscription)
@@ -1,80 +1,300 @@
+import asyncio
+import logging
 import os
-from typing import List, Dict, Union
-from openai import OpenAI
-from dotenv import load_dotenv
-from sqlmodel import Session, select
+import re
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, List, Dict, Literal, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, ValidationError, create_model
+from sqlmodel.ext.asyncio.session import AsyncSession
 import json # Import json module
 
-from ..models import Task, TaskCreate
-from ..db import get_session
+from db import async_session_maker
+from metrics import record_llm_call
+from models import TaskBulkUpdate, TaskCreate
+from services.jobs import enqueue_job, job_handler, job_pool
+from services.tasks import (
+    BULK_MAX_ITEMS, bulk_complete_tasks, bulk_create_tasks, bulk_delete_tasks, bulk_update_tasks, cached_search, cached_tasks_page,
+    create_task_row, delete_task_row, discard_task_changes, publish_task_changes, update_task_row,
+)
+
+# Concurrency and timeout settings for calls to the model
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8")) # In-flight completions per process
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "20")) # Size of the shared HTTP connection pool
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "60")) # Seconds per completion request
+AI_MAX_TOOL_ROUNDS = int(os.getenv("AI_MAX_TOOL_ROUNDS", "5")) # Model round-trips that may request tools
+AI_SUMMARY_MAX_TOKENS = int(os.getenv("AI_SUMMARY_MAX_TOKENS", "300")) # Length cap for conversation summaries
+AI_TASK_PAGE_SIZE = int(os.getenv("AI_TASK_PAGE_SIZE", "50")) # Most tasks one get_tasks_tool call puts in the prompt
+AI_PLAN_CACHE_SIZE = int(os.getenv("AI_PLAN_CACHE_SIZE", "1000")) # Distinct messages whose tool plan is remembered
+AI_PLAN_CACHE_MIN_SEEN = int(os.getenv("AI_PLAN_CACHE_MIN_SEEN", "2")) # Times in a row the model must pick a plan before it is reused
+AI_BACKGROUND_WRITES = os.getenv("AI_BACKGROUND_WRITES", "0") == "1" # Queue write tools as a job instead of running them in the request
+
+# Columns get_tasks_tool returns; timestamps and user_id only cost prompt tokens
+TOOL_TASK_FIELDS = ["id", "title", "description", "completed"]
+
+# The OpenAI client is built on first use. Importing openai (and httpx under it) is about a third
+# of the backend's import time, which processes that never chat - migrations, task-only
+# workers, a cold start whose first request lists tasks - should not pay for.
+openai_client = None
+
+class AIError(Exception):
+    """The model call failed."""
+
+class AITimeoutError(AIError):
+    """The model call timed out."""
+
+def get_openai_client():
+    global openai_client
+    if openai_client is None:
+        import httpx
+        from openai import AsyncOpenAI
+
+        # The async client shares one pooled HTTP client, so in-flight completions never block the event loop
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=AI_MAX_CONNECTIONS, max_keepalive_connections=AI_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(AI_REQUEST_TIMEOUT, connect=10.0),
+        )
+        # OPENAI_API_KEY comes from .env for local development and from the environment in production
+        openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
+    return openai_client
+
+def preload_ai_sdk():
+    # Imports the SDK without building the client; safe in a worker thread after startup
+    import httpx
+    import openai
+
+@contextmanager
+def model_errors():
+    # Re-raises the SDK's errors as AIError/AITimeoutError, so callers needn't import openai
+    from openai import APIError, APITimeoutError
 
-load_dotenv()
+    try:
+        yield
+    except APITimeoutError as error:
+        raise AITimeoutError(str(error)) from error
+    except APIError as error:
+        raise AIError(str(error)) from error
 
-# Initialize OpenAI Client
-# For local development, load OPENAI_API_KEY from .env
-# For production, it should be set as an environment variable
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+completion_slots = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+
+logger = logging.getLogger(__name__)
 
 # --- AI Tools Definition ---
 # These functions will be called by the AI agent based on user's natural language.
+# Write tools never commit; execute_tool_calls commits each round's writes in one transaction.
+
+async def get_tasks_tool(session: AsyncSession, status: str = "all", user_id: str = "test_user", limit: int = AI_TASK_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+    """
+    Retrieves one page of tasks for the specified user.
+    Can filter by status: 'all', 'pending', or 'completed'. Pass next_cursor back as cursor for the next page.
+    """
+    try:
+        tasks, next_cursor = await cached_tasks_page(
+            session, user_id, status_filter=status, cursor=cursor,
+            limit=max(1, min(limit, AI_TASK_PAGE_SIZE)), fields=TOOL_TASK_FIELDS,
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+    return {"tasks": tasks, "next_cursor": next_cursor}
 
-def get_tasks_tool(session: Session, status: str = "all", user_id: str = "test_user") -> List[Dict]:
+async def search_tasks_tool(session: AsyncSession, query: str, status: str = "all", limit: int = AI_TASK_PAGE_SIZE, user_id: str = "test_user") -> Dict:
     """
-    Retrieves a list of tasks for the specified user.
-    Can filter by status: 'all', 'pending', or 'completed'.
+    Finds the user's tasks whose title or description matches the query words, best matches first.
     """
-    query = select(Task).where(Task.user_id == user_id)
-    if status == "pending":
-        query = query.where(Task.completed == False)
-    elif status == "completed":
-        query = query.where(Task.completed == True)
-    
-    tasks = session.exec(query).all()
-    # Convert Task objects to dictionaries for tool output
-    return [{"id": task.id, "title": task.title, "description": task.description, "completed": task.completed} for task in tasks]
+    tasks = await cached_search(
+        session, user_id, query, status_filter=status, limit=max(1, min(limit, AI_TASK_PAGE_SIZE)), fields=TOOL_TASK_FIELDS
+    )
+    return {"tasks": tasks}
 
-def create_task_tool(session: Session, title: str, description: str = "", user_id: str = "test_user") -> Dict:
+async def create_task_tool(session: AsyncSession, title: str, description: str = "", user_id: str = "test_user") -> Dict:
     """
     Creates a new task for the user with a given title and optional description.
     """
-    new_task = Task(title=title, description=description, user_id=user_id)
-    session.add(new_task)
-    session.commit()
-    session.refresh(new_task)
-    return {"id": new_task.id, "title": new_task.title, "description": new_task.description, "completed": new_task.completed}
+    task = await create_task_row(session, user_id, title, description)
+    return {name: task[name] for name in TOOL_TASK_FIELDS}
 
-def mark_task_complete_tool(session: Session, task_id: int, user_id: str = "test_user") -> Dict:
+async def mark_task_complete_tool(session: AsyncSession, task_id: int, user_id: str = "test_user") -> Dict:
     """
     Marks an existing task as completed.
     """
-    task = session.exec(select(Task).where(Task.id == task_id, Task.user_id == user_id)).first()
+    task = await update_task_row(session, user_id, task_id, completed=True)
     if not task:
         return {"error": f"Task with ID {task_id} not found."}
-    task.completed = True
-    session.add(task)
-    session.commit()
-    session.refresh(task)
-    return {"id": task.id, "title": task.title, "completed": task.completed}
+    return {"id": task["id"], "title": task["title"], "completed": task["completed"]}
 
-def delete_task_tool(session: Session, task_id: int, user_id: str = "test_user") -> Dict:
+async def delete_task_tool(session: AsyncSession, task_id: int, user_id: str = "test_user") -> Dict:
     """
     Deletes an existing task.
     """
-    task = session.exec(select(Task).where(Task.id == task_id, Task.user_id == user_id)).first()
-    if not task:
+    if not await delete_task_row(session, user_id, task_id):
         return {"error": f"Task with ID {task_id} not found."}
-    session.delete(task)
-    session.commit()
     return {"status": f"Task with ID {task_id} deleted successfully."}
 
+def bulk_tool_result(results: List[Dict]) -> Dict:
+    # Per-item results with tasks trimmed to the columns the model needs
+    for result in results:
+        if "task" in result:
+            result["task"] = {name: result["task"][name] for name in TOOL_TASK_FIELDS}
+    return {"results": results}
+
+def batch_too_large(items: List) -> Optional[Dict]:
+    if len(items) > BULK_MAX_ITEMS:
+        return {"error": f"At most {BULK_MAX_ITEMS} items per call."}
+    return None
+
+async def create_tasks_tool(session: AsyncSession, tasks: List[Dict], user_id: str = "test_user") -> Dict:
+    """
+    Creates several tasks at once. Each item has a title and an optional description.
+    """
+    error = batch_too_large(tasks)
+    if error:
+        return error
+    try:
+        items = [TaskCreate(**item).dict() for item in tasks]
+    except (TypeError, ValueError):
+        return {"error": "Each task needs a title and may have a description."}
+    return bulk_tool_result(await bulk_create_tasks(session, user_id, items))
+
+async def update_tasks_tool(session: AsyncSession, updates: List[Dict], user_id: str = "test_user") -> Dict:
+    """
+    Updates several tasks at once. Each item has a task id and the title, description or completed value to set.
+    """
+    error = batch_too_large(updates)
+    if error:
+        return error
+    try:
+        items = [TaskBulkUpdate(**item).dict(exclude_unset=True) for item in updates]
+    except (TypeError, ValueError):
+        return {"error": "Each update needs a task id and may set title, description or completed."}
+    return bulk_tool_result(await bulk_update_tasks(session, user_id, items))
+
+async def mark_tasks_complete_tool(session: AsyncSession, task_ids: List[int], user_id: str = "test_user") -> Dict:
+    """
+    Marks several existing tasks as completed.
+    """
+    return batch_too_large(task_ids) or bulk_tool_result(await bulk_complete_tasks(session, user_id, task_ids))
+
+async def delete_tasks_tool(session: AsyncSession, task_ids: List[int], user_id: str = "test_user") -> Dict:
+    """
+    Deletes several existing tasks.
+    """
+    return batch_too_large(task_ids) or bulk_tool_result(await bulk_delete_tasks(session, user_id, task_ids))
+
 # Map tool names to their corresponding functions
 available_tools = {
     "get_tasks_tool": get_tasks_tool,
+    "search_tasks_tool": search_tasks_tool,
     "create_task_tool": create_task_tool,
     "mark_task_complete_tool": mark_task_complete_tool,
     "delete_task_tool": delete_task_tool,
+    "create_tasks_tool": create_tasks_tool,
+    "update_tasks_tool": update_tasks_tool,
+    "mark_tasks_complete_tool": mark_tasks_complete_tool,
+    "delete_tasks_tool": delete_tasks_tool,
 }
 
+# Tools that never write; they run concurrently, each on its own session
+read_only_tools = {"get_tasks_tool", "search_tasks_tool"}
+
+# --- Tool plan cache ---
+
+# Words that change how a request is phrased, not what it asks for
+INTENT_FILLER_WORDS = {"please", "pls", "kindly", "hey", "hi", "hello", "thanks", "thank", "you", "can", "could", "would"}
+
+ToolPlan = Tuple[Tuple[str, str], ...] # (function_name, json_arguments) per call
+
+# Arguments parse_tool_arguments fills in for the requesting user; never part of a stored plan
+SERVER_ARGUMENTS = {"user_id"}
+
+def plan_arguments(arguments: str) -> Dict:
+    # The model's arguments minus the ones that name the user, so a plan is shared by every user
+    # and replaying it into another user's prompt (or their tool_call events) shows nothing of the first
+    parsed = json.loads(arguments or "{}")
+    if not isinstance(parsed, dict):
+        raise ValueError("Tool arguments must be a JSON object.")
+    return {name: value for name, value in parsed.items() if name not in SERVER_ARGUMENTS}
+
+def normalize_intent(message: str) -> Optional[str]:
+    # "Show my pending tasks, please!" and "show my pending tasks" share a key
+    words = [word for word in re.findall(r"[^\W_]+", message.lower()) if word not in INTENT_FILLER_WORDS]
+    return " ".join(words) or None
+
+class ToolPlanCache:
+    """
+    Remembers the first tool round the model chose for a normalized user message, so a repeat of
+    that message runs its tools straight away and skips the model call that would pick them.
+    Only plans made entirely of read-only tools are kept: replaying them against current data is
+    always safe, and record() strips the arguments that name the user (parse_tool_arguments fills them in).
+    A plan is reused only once the model has chosen it AI_PLAN_CACHE_MIN_SEEN times in a row for
+    the message, which keeps one-off and context-dependent choices ("yes", "the first one") out.
+    """
+    def __init__(self, max_entries: int = AI_PLAN_CACHE_SIZE, min_seen: int = AI_PLAN_CACHE_MIN_SEEN):
+        self.max_entries = max_entries
+        self.min_seen = min_seen
+        self.entries: "OrderedDict[str, Tuple[ToolPlan, int]]" = OrderedDict() # key -> (plan, times seen in a row)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, message: str) -> Optional[ToolPlan]:
+        key = normalize_intent(message)
+        entry = self.entries.get(key) if key else None
+        if entry is None or entry[1] < self.min_seen:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def record(self, message: str, calls: List[Tuple[str, str]]):
+        # Called with the tool calls the model chose in its first round for this message
+        key = normalize_intent(message)
+        if key is None:
+            return
+        try:
+            plan = tuple((name, json.dumps(plan_arguments(arguments), sort_keys=True)) for name, arguments in calls)
+        except ValueError:
+            plan = ()
+        if not plan or any(name not in read_only_tools for name, _ in plan):
+            self.entries.pop(key, None) # The model handled this message differently; start over
+            return
+        previous = self.entries.get(key)
+        seen = previous[1] + 1 if previous and previous[0] == plan else 1
+        self.entries[key] = (plan, seen)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "evictions": self.evictions,
+        }
+
+tool_plan_cache = ToolPlanCache()
+
+def plan_message(plan: ToolPlan) -> Dict:
+    # The assistant message the model would have sent to make these calls
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [
+            {"id": f"plan_{i}", "type": "function", "function": {"name": name, "arguments": arguments}}
+            for i, (name, arguments) in enumerate(plan)
+        ],
+    }
+
 # --- OpenAI Tool Definitions (for the API call) ---
 # These are the schema descriptions for OpenAI to understand what tools are available.
 
@@ -83,7 +303,7 @@ openai_tools = [
         "type": "function",
         "function": {
             "name": "get_tasks_tool",
-            "description": "Retrieves a list of tasks for the specified user. Can filter by status: 'all', 'pending', or 'completed'.",
+            "description": "Retrieves one page of tasks for the specified user, ordered with pending tasks first. Can filter by status: 'all', 'pending', or 'completed'. If next_cursor is not null, more tasks exist; pass it as cursor to get them.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -92,6 +312,14 @@ openai_tools = [
                         "enum": ["all", "pending", "completed"],
                         "description": "Filter tasks by status: 'all', 'pending', or 'completed'. Defaults to 'all'."
                     },
+                    "limit": {
+                        "type": "integer",
+                        "description": f"Maximum number of tasks to return (at most {AI_TASK_PAGE_SIZE})."
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "The next_cursor value from a previous call, to fetch the following page."
+                    },
                     "user_id": {
                         "type": "string",
                         "description": "The ID of the user whose tasks to retrieve."
@@ -101,6 +329,36 @@ openai_tools = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_tasks_tool",
+            "description": "Finds the user's tasks by words in their title or description, best matches first. Use this instead of listing every task when looking for particular tasks.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Words to look for; every word must match, and partial words match as prefixes."
+                    },
+                    "status": {
+                        "type": "string",
+                        "enum": ["all", "pending", "completed"],
+                        "description": "Only search tasks with this status. Defaults to 'all'."
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": f"Maximum number of tasks to return (at most {AI_TASK_PAGE_SIZE})."
+                    },
+                    "user_id": {
+                        "type": "string",
+                        "description": "The ID of the user whose tasks to search."
+                    }
+                },
+                "required": ["query", "user_id"]
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -168,69 +426,418 @@ openai_tools = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_tasks_tool",
+            "description": "Creates several tasks for the user in one call. Prefer this over repeated create_task_tool calls when adding more than one task.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "tasks": {
+                        "type": "array",
+                        "description": "The tasks to create.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "title": {"type": "string", "description": "The title of the task."},
+                                "description": {"type": "string", "description": "An optional description for the task."}
+                            },
+                            "required": ["title"]
+                        }
+                    },
+                    "user_id": {
+                        "type": "string",
+                        "description": "The ID of the user for whom to create the tasks."
+                    }
+                },
+                "required": ["tasks", "user_id"]
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "update_tasks_tool",
+            "description": "Updates the title, description or completed status of several tasks in one call.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "updates": {
+                        "type": "array",
+                        "description": "One entry per task to change; omitted fields are left as they are.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "id": {"type": "integer", "description": "The ID of the task to update."},
+                                "title": {"type": "string", "description": "The new title."},
+                                "description": {"type": "string", "description": "The new description."},
+                                "completed": {"type": "boolean", "description": "The new completed status."}
+                            },
+                            "required": ["id"]
+                        }
+                    },
+                    "user_id": {
+                        "type": "string",
+                        "description": "The ID of the user whose tasks to update."
+                    }
+                },
+                "required": ["updates", "user_id"]
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "mark_tasks_complete_tool",
+            "description": "Marks several existing tasks as completed in one call.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "task_ids": {
+                        "type": "array",
+                        "items": {"type": "integer"},
+                        "description": "The IDs of the tasks to mark as complete."
+                    },
+                    "user_id": {
+                        "type": "string",
+                        "description": "The ID of the user whose tasks to mark complete."
+                    }
+                },
+                "required": ["task_ids", "user_id"]
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "delete_tasks_tool",
+            "description": "Deletes several existing tasks in one call.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "task_ids": {
+                        "type": "array",
+                        "items": {"type": "integer"},
+                        "description": "The IDs of the tasks to delete."
+                    },
+                    "user_id": {
+                        "type": "string",
+                        "description": "The ID of the user whose tasks to delete."
+                    }
+                },
+                "required": ["task_ids", "user_id"]
+            },
+        },
+    },
 ]
 
+# Tool arguments are checked against the same schemas before a tool runs. Values the model sent
+# as the wrong type are coerced where pydantic can ("10" -> 10) and rejected otherwise, as are
+# nulls for required arguments; a null optional argument falls back to the tool's default.
+JSON_SCHEMA_TYPES = {"string": str, "integer": int, "number": float, "boolean": bool, "object": Dict[str, Any]}
+
+def schema_type(schema: Dict):
+    if "enum" in schema:
+        return Literal[tuple(schema["enum"])]
+    if schema.get("type") == "array":
+        return List[schema_type(schema.get("items", {}))]
+    # Objects inside arrays stay dicts; the bulk tools validate each item with the task models
+    return JSON_SCHEMA_TYPES.get(schema.get("type"), Any)
+
+def tool_arguments_model(tool: Dict) -> Type[BaseModel]:
+    parameters = tool["function"]["parameters"]
+    required = set(parameters.get("required", []))
+    fields = {
+        name: (schema_type(schema), ...) if name in required else (Optional[schema_type(schema)], None)
+        for name, schema in parameters["properties"].items()
+    }
+    return create_model(f"{tool['function']['name']}_arguments", **fields)
+
+tool_argument_models = {tool["function"]["name"]: tool_arguments_model(tool) for tool in openai_tools}
+
 # --- Main AI Chat Function ---
 
-async def get_ai_response(user_message: str, conversation_messages: List[Dict], session: Session, user_id: str) -> str:
-    messages = [
+async def create_chat_completion(messages: List[Dict], tool_choice: str = "auto", round_number: Optional[int] = None):
+    # Waits for a free slot so a burst of chats can't exhaust the pool or the model rate limit
+    async with completion_slots:
+        started = time.perf_counter()
+        with model_errors():
+            response = await get_openai_client().chat.completions.create(
+                model="gpt-4", # Using a powerful model for function calling
+                messages=messages,
+                tools=openai_tools,
+                tool_choice=tool_choice, # "auto" lets the model decide whether to call a tool or respond
+                timeout=AI_REQUEST_TIMEOUT,
+            )
+    record_llm_call("chat", round_number, time.perf_counter() - started, response.usage)
+    return response
+
+async def stream_chat_completion(messages: List[Dict], tool_choice: str = "auto", round_number: Optional[int] = None) -> AsyncIterator:
+    # Same as create_chat_completion, but yields chunks and holds the slot until the stream ends
+    async with completion_slots:
+        started = time.perf_counter()
+        usage = None
+        with model_errors():
+            stream = await get_openai_client().chat.completions.create(
+                model="gpt-4",
+                messages=messages,
+                tools=openai_tools,
+                tool_choice=tool_choice,
+                stream=True,
+                stream_options={"include_usage": True}, # Usage arrives in a final chunk with no choices
+                timeout=AI_REQUEST_TIMEOUT,
+            )
+            async for chunk in stream:
+                usage = chunk.usage or usage
+                yield chunk
+    record_llm_call("chat_stream", round_number, time.perf_counter() - started, usage)
+
+async def summarize_messages(previous_summary: str, conversation_messages: List[Dict]) -> str:
+    # Folds older turns into the running summary; the prompt is bounded by the batch being folded
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in conversation_messages)
+    async with completion_slots:
+        started = time.perf_counter()
+        with model_errors():
+            response = await get_openai_client().chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": "You maintain a short running summary of a todo-assistant conversation. Update the summary with the new messages. Keep task titles, IDs, decisions and open requests; drop small talk. Reply with the summary only."},
+                    {"role": "user", "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"},
+                ],
+                max_tokens=AI_SUMMARY_MAX_TOKENS,
+                timeout=AI_REQUEST_TIMEOUT,
+            )
+    record_llm_call("summary", None, time.perf_counter() - started, response.usage)
+    return response.choices[0].message.content or previous_summary
+
+async def close_ai_client():
+    global openai_client
+    if openai_client is not None:
+        await openai_client.close()
+        openai_client = None
+
+def build_messages(user_message: str, conversation_messages: List[Dict]) -> List[Dict]:
+    return [
         {"role": "system", "content": "You are a helpful AI assistant for managing todo tasks. You have access to tools to create, view, mark complete, and delete tasks. Always respond in a helpful and concise manner. If asked to mark a task complete or delete a task, first confirm the task exists by listing tasks if you are unsure of the ID."},
         *conversation_messages, # Previous messages in the conversation
         {"role": "user", "content": user_message}
     ]
 
-    response = openai_client.chat.completions.create(
-        model="gpt-4", # Using a powerful model for function calling
-        messages=messages,
-        tools=openai_tools,
-        tool_choice="auto", # Let the model decide whether to call a tool or respond
-    )
+def invalid_arguments(function_name: str, error: ValueError) -> Dict:
+    # The model gets told which arguments were wrong, so it can fix them and call again
+    if isinstance(error, ValidationError):
+        problems = "; ".join(f"{'.'.join(map(str, problem['loc']))}: {problem['msg']}" for problem in error.errors())
+        return {"error": f"Invalid arguments for {function_name}: {problems}"}
+    return {"error": f"Invalid arguments for {function_name}."}
 
-    response_message = response.choices[0].message
-    tool_calls = response_message.tool_calls
-
-    if tool_calls:
-        # Step 2: check if the model wanted to call a tool
-        # Step 3: call the tool
-        # Note: the JSON response may not always be valid; be sure to handle errors
-        
-        # Extend conversation with the assistant's reply (tool_calls)
-        messages.append(response_message)
-        
-        for tool_call in tool_calls:
-            function_name = tool_call.function.name
-            function_to_call = available_tools[function_name]
-            function_args = tool_call.function.arguments
-            
-            # Inject user_id into tool arguments if not present (handled by tool definitions)
-            if "user_id" not in function_args:
-                function_args_dict = json.loads(function_args) # Parse to dict
-                function_args_dict["user_id"] = user_id
-                # Special handling for get_tasks_tool 'status' - default to 'all' if not provided
-                if function_name == "get_tasks_tool" and "status" not in function_args_dict:
-                    function_args_dict["status"] = "all"
-                function_args = json.dumps(function_args_dict) # Convert back to string
-            
-            # Execute the tool function
-            tool_response = function_to_call(session=session, **json.loads(function_args))
-            
-            # Extend conversation with tool output
-            messages.append(
-                {
-                    "tool_call_id": tool_call.id,
-                    "role": "tool",
-                    "name": function_name,
-                    "content": json.dumps(tool_response),
-                }
-            )
-        
-        # Step 4: send the info for each tool call and tool response to the model
-        second_response = openai_client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            tools=openai_tools,
-            tool_choice="auto",
+def parse_tool_arguments(function_name: str, function_args: str, user_id: str) -> Dict:
+    # Raises ValueError (bad JSON or a ValidationError) for arguments the tool can't take
+    function_args_dict = json.loads(function_args or "{}")
+    if not isinstance(function_args_dict, dict):
+        raise ValueError("Tool arguments must be a JSON object.")
+    # Tools always act for the requesting user, whatever user_id the model filled in
+    function_args_dict["user_id"] = user_id
+    arguments = tool_argument_models[function_name].model_validate(function_args_dict)
+    return arguments.model_dump(exclude_none=True)
+
+def tool_failed(function_name: str, error: Exception) -> Dict:
+    logger.warning("Tool %s failed", function_name, exc_info=error)
+    return {"error": f"{function_name} failed; nothing was changed by this call."}
+
+async def apply_write_tools(session: AsyncSession, calls: List[Tuple[str, Dict]]) -> List[Dict]:
+    # Runs a round's write tools on one session without committing. A tool that raises gets an
+    # error result and the round is rolled back and run again without it, so the other writes
+    # still land together. (Savepoints would avoid the rerun, but pysqlite commits on releasing one.)
+    failed: Dict[int, Dict] = {}
+    while True:
+        results = []
+        try:
+            for i, (function_name, function_args) in enumerate(calls):
+                if i not in failed:
+                    results.append(await available_tools[function_name](session=session, **function_args))
+                else:
+                    results.append(failed[i])
+            return results
+        except Exception as error:
+            await session.rollback()
+            discard_task_changes(session)
+            failed[len(results)] = tool_failed(function_name, error)
+
+async def run_write_tools(session: AsyncSession, calls: List[Tuple[str, Dict]]) -> List[Dict]:
+    # Runs a round's write tools on one session and commits them together
+    try:
+        results = await apply_write_tools(session, calls)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        discard_task_changes(session)
+        raise
+    return results
+
+@job_handler("chat_tools")
+async def run_queued_write_tools(session: AsyncSession, job: Dict) -> Dict:
+    # A round of write tools queued by execute_tool_calls; the arguments already carry user_id
+    calls = [(function_name, function_args) for function_name, function_args in job["payload"]["calls"]]
+    return {"results": await apply_write_tools(session, calls)}
+
+async def queue_write_tools(session: AsyncSession, user_id: str, calls: List[Tuple[str, Dict]]) -> List[Dict]:
+    # The round's writes become one job, so they still land in one transaction, just after the reply
+    job = await enqueue_job(session, user_id, "chat_tools", {"calls": [[name, args] for name, args in calls]})
+    await session.commit()
+    job_pool.wake()
+    return [
+        {"status": "queued", "job_id": job["id"], "detail": "The change will be applied in the background shortly."}
+        for _ in calls
+    ]
+
+async def run_read_tool(function_name: str, function_args: Dict) -> Union[Dict, List[Dict]]:
+    async with async_session_maker() as session:
+        try:
+            return await available_tools[function_name](session=session, **function_args)
+        except Exception as error:
+            return tool_failed(function_name, error)
+
+async def execute_tool_calls(session: AsyncSession, user_id: str, calls: List[Tuple[str, str]]) -> List[Union[Dict, List[Dict]]]:
+    """
+    Executes one round of (function_name, json_arguments) tool calls and returns their results in order.
+    The model only issues calls in the same round when they are independent, so all writes run in a
+    single transaction on `session`, then the reads run concurrently and see those writes.
+    With AI_BACKGROUND_WRITES the writes are queued as one job instead and report the job id;
+    reads in the same round then may not see them yet.
+    """
+    results: List[Union[Dict, List[Dict], None]] = [None] * len(calls)
+    writes, reads = [], []
+    for i, (function_name, function_args) in enumerate(calls):
+        if function_name not in available_tools:
+            results[i] = {"error": f"Unknown tool {function_name}."}
+            continue
+        try:
+            parsed_args = parse_tool_arguments(function_name, function_args, user_id)
+        except ValueError as error:
+            results[i] = invalid_arguments(function_name, error)
+            continue
+        (reads if function_name in read_only_tools else writes).append((i, function_name, parsed_args))
+
+    if writes and AI_BACKGROUND_WRITES:
+        write_results = await queue_write_tools(session, user_id, [(name, args) for _, name, args in writes])
+        for (i, _, _), result in zip(writes, write_results):
+            results[i] = result
+    elif writes:
+        write_results = await run_write_tools(session, [(name, args) for _, name, args in writes])
+        for (i, _, _), result in zip(writes, write_results):
+            results[i] = result
+        # Committed; drop cached task lists before the reads below run and tell subscribed clients
+        await publish_task_changes(session)
+    if reads:
+        read_results = await asyncio.gather(*(run_read_tool(name, args) for _, name, args in reads))
+        for (i, _, _), result in zip(reads, read_results):
+            results[i] = result
+    return results
+
+def tool_result_message(tool_call_id: str, function_name: str, result: Union[Dict, List[Dict]]) -> Dict:
+    return {
+        "tool_call_id": tool_call_id,
+        "role": "tool",
+        "name": function_name,
+        "content": json.dumps(result),
+    }
+
+async def get_ai_response(user_message: str, conversation_messages: List[Dict], session: AsyncSession, user_id: str) -> str:
+    messages = build_messages(user_message, conversation_messages)
+
+    # A repeated request runs its cached tool plan as round 0, against current data
+    plan = tool_plan_cache.get(user_message)
+    if plan:
+        assistant_message = plan_message(plan)
+        messages.append(assistant_message)
+        results = await execute_tool_calls(session, user_id, list(plan))
+        for tool_call, result in zip(assistant_message["tool_calls"], results):
+            messages.append(tool_result_message(tool_call["id"], tool_call["function"]["name"], result))
+
+    # Let the model call tools for up to AI_MAX_TOOL_ROUNDS round-trips, so compound
+    # requests ("add these and show pending") don't need a new chat turn per step
+    for round_number in range(1 if plan else 0, AI_MAX_TOOL_ROUNDS):
+        response = await create_chat_completion(messages, round_number=round_number)
+        response_message = response.choices[0].message
+        tool_calls = response_message.tool_calls
+        if round_number == 0:
+            tool_plan_cache.record(user_message, [(tool_call.function.name, tool_call.function.arguments) for tool_call in tool_calls or []])
+        if not tool_calls:
+            return response_message.content
+
+        # Extend conversation with the assistant's reply (tool_calls) and each tool's output
+        messages.append(response_message.model_dump(exclude_none=True))
+        results = await execute_tool_calls(
+            session, user_id, [(tool_call.function.name, tool_call.function.arguments) for tool_call in tool_calls]
         )
-        return second_response.choices[0].message.content
-    else:
-        return response_message.content
+        for tool_call, result in zip(tool_calls, results):
+            messages.append(tool_result_message(tool_call.id, tool_call.function.name, result))
+
+    # Out of tool rounds: ask for an answer from what the tools returned so far
+    final_response = await create_chat_completion(messages, tool_choice="none", round_number=AI_MAX_TOOL_ROUNDS)
+    return final_response.choices[0].message.content
+
+async def stream_ai_response(user_message: str, conversation_messages: List[Dict], session: AsyncSession, user_id: str) -> AsyncIterator[Dict]:
+    """
+    Streaming variant of get_ai_response. Yields events as they happen:
+    {"type": "token", "content": ...} for each content delta,
+    {"type": "tool_call", "name": ..., "arguments": ...} before a tool runs and
+    {"type": "tool_result", "name": ..., "result": ...} after it returns.
+    """
+    messages = build_messages(user_message, conversation_messages)
+
+    plan = tool_plan_cache.get(user_message)
+    if plan:
+        assistant_message = plan_message(plan)
+        messages.append(assistant_message)
+        for name, arguments in plan:
+            yield {"type": "tool_call", "name": name, "arguments": arguments}
+        results = await execute_tool_calls(session, user_id, list(plan))
+        for tool_call, result in zip(assistant_message["tool_calls"], results):
+            yield {"type": "tool_result", "name": tool_call["function"]["name"], "result": result}
+            messages.append(tool_result_message(tool_call["id"], tool_call["function"]["name"], result))
+
+    for round_number in range(1 if plan else 0, AI_MAX_TOOL_ROUNDS + 1):
+        # The extra final round forbids tools so the stream always ends with an answer
+        tool_choice = "auto" if round_number < AI_MAX_TOOL_ROUNDS else "none"
+
+        # Tool call deltas arrive in pieces keyed by index; stitch them back together
+        tool_calls: Dict[int, Dict] = {}
+        content = []
+        async for chunk in stream_chat_completion(messages, tool_choice=tool_choice, round_number=round_number):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content.append(delta.content)
+                yield {"type": "token", "content": delta.content}
+            for tool_call_delta in delta.tool_calls or []:
+                call = tool_calls.setdefault(tool_call_delta.index, {"id": None, "name": "", "arguments": ""})
+                if tool_call_delta.id:
+                    call["id"] = tool_call_delta.id
+                if tool_call_delta.function and tool_call_delta.function.name:
+                    call["name"] += tool_call_delta.function.name
+                if tool_call_delta.function and tool_call_delta.function.arguments:
+                    call["arguments"] += tool_call_delta.function.arguments
+
+        calls = list(tool_calls.values())
+        if round_number == 0:
+            tool_plan_cache.record(user_message, [(call["name"], call["arguments"]) for call in calls])
+        if not calls:
+            return
+
+        messages.append({
+            "role": "assistant",
+            "content": "".join(content) or None,
+            "tool_calls": [
+                {"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": call["arguments"]}}
+                for call in calls
+            ],
+        })
+        for call in calls:
+            yield {"type": "tool_call", "name": call["name"], "arguments": call["arguments"]}
+        results = await execute_tool_calls(session, user_id, [(call["name"], call["arguments"]) for call in calls])
+        for call, result in zip(calls, results):
+            yield {"type": "tool_result", "name": call["name"], "result": result}
+            messages.append(tool_result_message(call["id"], call["name"], result))
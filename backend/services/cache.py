@@ -0,0 +1,168 @@
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set, Tuple
+
+# Read-through cache for task reads
+TASK_CACHE_URL = os.getenv("TASK_CACHE_URL", "memory://") # memory:// or a redis:// URL
+TASK_CACHE_TTL = float(os.getenv("TASK_CACHE_TTL", "30")) # Seconds an entry may be served
+TASK_CACHE_MAX_ENTRIES = int(os.getenv("TASK_CACHE_MAX_ENTRIES", "10000")) # In-process backend only
+
+MISSING = object()
+
+# Entries are stored under (user_id, generation, key). Invalidating a user bumps their
+# generation instead of hunting down keys, which also makes a read that started before a
+# write harmless: it stores its result under the old generation, where nobody looks.
+# The generation doubles as the user's task version, which the routes turn into ETags.
+
+class MemoryCacheBackend:
+    # LRU with a per-entry TTL, local to this process
+    def __init__(self, ttl: float = TASK_CACHE_TTL, max_entries: int = TASK_CACHE_MAX_ENTRIES):
+        # Generations restart at 0 with the process; the epoch keeps old versions from matching new ones.
+        # They are also per process, so run a single worker or use the Redis backend.
+        self.epoch = uuid.uuid4().hex[:8]
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, int, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self.generations: Dict[str, int] = {}
+        self.user_keys: Dict[str, Set[Tuple[str, int, Hashable]]] = {} # Lets invalidate skip other users' entries
+
+    async def generation(self, user_id: str) -> int:
+        return self.generations.get(user_id, 0)
+
+    async def get(self, user_id: str, generation: int, key: Hashable) -> Any:
+        entry_key = (user_id, generation, key)
+        entry = self.entries.get(entry_key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._discard(entry_key)
+            return MISSING
+        self.entries.move_to_end(entry_key)
+        return value
+
+    async def set(self, user_id: str, generation: int, key: Hashable, value: Any):
+        if generation != self.generations.get(user_id, 0):
+            return
+        entry_key = (user_id, generation, key)
+        self.entries[entry_key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(entry_key)
+        self.user_keys.setdefault(user_id, set()).add(entry_key)
+        while len(self.entries) > self.max_entries:
+            self._discard(next(iter(self.entries)))
+
+    async def invalidate(self, user_id: str):
+        self.generations[user_id] = self.generations.get(user_id, 0) + 1
+        # Old-generation entries can never be read again; drop them now rather than waiting for LRU
+        for entry_key in self.user_keys.pop(user_id, ()):
+            del self.entries[entry_key]
+
+    def _discard(self, entry_key: Tuple[str, int, Hashable]):
+        del self.entries[entry_key]
+        keys = self.user_keys[entry_key[0]]
+        keys.discard(entry_key)
+        if not keys:
+            del self.user_keys[entry_key[0]]
+
+    async def close(self):
+        self.entries.clear()
+        self.user_keys.clear()
+
+class RedisCacheBackend:
+    # Shared across processes. Works with any client exposing the redis.asyncio API
+    # (hmget/hsetnx/hincrby/hget/hset/expire), so tests can pass fakeredis.aioredis.FakeRedis()
+    def __init__(self, client, ttl: float = TASK_CACHE_TTL, prefix: str = "tasks"):
+        self.epoch = "r" # Generations carry their own epoch, kept in Redis; see generation()
+        self.client = client
+        self.ttl = max(1, int(ttl))
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisCacheBackend":
+        import redis.asyncio as redis # Optional dependency, only needed for a redis:// TASK_CACHE_URL
+        return cls(redis.from_url(url), **kwargs)
+
+    async def generation(self, user_id: str) -> str:
+        # "<epoch>.<counter>". The epoch is a random token stored next to the user's counter, so when
+        # Redis is flushed, restarts empty or evicts the counter, counting starts again under a new
+        # epoch and neither old ETags nor old entries can match the new generations.
+        name = f"{self.prefix}:{user_id}:version"
+        epoch, counter = await self.client.hmget(name, "epoch", "counter")
+        if epoch is None:
+            await self.client.hsetnx(name, "epoch", uuid.uuid4().hex[:8]) # The first process to get here picks it
+            epoch, counter = await self.client.hmget(name, "epoch", "counter")
+        epoch = epoch.decode() if isinstance(epoch, bytes) else epoch
+        return f"{epoch}.{int(counter or 0)}"
+
+    async def get(self, user_id: str, generation: str, key: Hashable) -> Any:
+        raw = await self.client.hget(f"{self.prefix}:{user_id}:{generation}", json.dumps(key))
+        return MISSING if raw is None else json.loads(raw)
+
+    async def set(self, user_id: str, generation: str, key: Hashable, value: Any):
+        # One hash per user and generation, so a whole generation expires together
+        name = f"{self.prefix}:{user_id}:{generation}"
+        await self.client.hset(name, json.dumps(key), json.dumps(value, default=datetime.isoformat)) # Timestamps come back as ISO strings
+        await self.client.expire(name, self.ttl)
+
+    async def invalidate(self, user_id: str):
+        await self.client.hincrby(f"{self.prefix}:{user_id}:version", "counter", 1)
+
+    async def close(self):
+        await self.client.aclose()
+
+class TaskCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_url(cls, url: str = TASK_CACHE_URL) -> "TaskCache":
+        if url.startswith(("redis://", "rediss://", "unix://")):
+            return cls(RedisCacheBackend.from_url(url))
+        return cls(MemoryCacheBackend())
+
+    async def get_or_load(self, user_id: str, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns the cached value for (user_id, key), or awaits loader() and caches what it returns.
+        Values must be JSON-serializable so every backend can store them; None is never cached.
+        """
+        generation = await self.backend.generation(user_id)
+        value = await self.backend.get(user_id, generation, key)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = await loader()
+        if value is not None:
+            await self.backend.set(user_id, generation, key, value)
+        return value
+
+    async def invalidate(self, user_id: str):
+        # Call after the write has committed, so the next read can only see the new data
+        self.invalidations += 1
+        await self.backend.invalidate(user_id)
+
+    async def version(self, user_id: str) -> str:
+        # Changes whenever any of the user's tasks change; cheap enough to check before every read
+        return f"{self.backend.epoch}.{await self.backend.generation(user_id)}"
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    async def close(self):
+        await self.backend.close()
+
+task_cache = TaskCache.from_url()
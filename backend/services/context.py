@@ -0,0 +1,101 @@
+import os
+from typing import List, Dict, Sequence
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import dialect_insert
+from models import ConversationSummary, Message, utc_now
+from services.ai import summarize_messages
+
+# Token budgets for the history sent with each chat turn
+AI_CONTEXT_TOKEN_BUDGET = int(os.getenv("AI_CONTEXT_TOKEN_BUDGET", "2000")) # Recent messages sent verbatim
+AI_SUMMARY_BATCH_TOKENS = int(os.getenv("AI_SUMMARY_BATCH_TOKENS", "1500")) # Overflow folded into the summary per model call
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text, plus per-message overhead
+    return len(text) // 4 + 4
+
+class ConversationContext:
+    """
+    The history to send with the next turn: a cached summary of older turns followed by the
+    most recent messages that fit in AI_CONTEXT_TOKEN_BUDGET. Messages that fall out of the
+    window are folded into the summary, so both parts of the prompt stay bounded however long
+    the conversation gets. Folding calls the model, so it is kept apart from the database work:
+    load, then fold() with no transaction open, then save_summary() with the reply.
+    """
+    def __init__(self, conversation_id: int, summary: str = "", through_message_id: int = 0, messages: Sequence = ()):
+        self.conversation_id = conversation_id
+        self.summary = summary
+        self.through_message_id = through_message_id
+        self.summary_changed = False
+
+        # Walk back from the newest message until the window budget is spent
+        window_start = len(messages)
+        window_tokens = 0
+        while window_start > 0:
+            tokens = estimate_tokens(messages[window_start - 1].content)
+            if window_tokens + tokens > AI_CONTEXT_TOKEN_BUDGET:
+                break
+            window_tokens += tokens
+            window_start -= 1
+        self.overflow, self.window = list(messages[:window_start]), list(messages[window_start:])
+
+    @property
+    def needs_fold(self) -> bool:
+        # Only pay for a summary call once enough overflow has built up
+        overflow_tokens = sum(estimate_tokens(message.content) for message in self.overflow)
+        return overflow_tokens >= AI_SUMMARY_BATCH_TOKENS or bool(self.overflow and not self.window)
+
+    async def fold(self) -> None:
+        if not self.needs_fold:
+            return
+        batch, batch_tokens = [], 0
+        for message in self.overflow:
+            batch.append({"role": message.role, "content": message.content})
+            batch_tokens += estimate_tokens(message.content)
+            if batch_tokens >= AI_SUMMARY_BATCH_TOKENS or message is self.overflow[-1]:
+                self.summary = await summarize_messages(self.summary, batch)
+                batch, batch_tokens = [], 0
+        self.through_message_id = self.overflow[-1].id
+        self.overflow = []
+        self.summary_changed = True
+
+    def messages(self) -> List[Dict]:
+        context = []
+        if self.summary:
+            context.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        context.extend({"role": message.role, "content": message.content} for message in [*self.overflow, *self.window])
+        return context
+
+async def load_conversation_context(session: AsyncSession, conversation_id: int) -> ConversationContext:
+    # Two reads: the summary, then only the messages newer than it
+    summary = (await session.exec(
+        select(ConversationSummary.summary, ConversationSummary.through_message_id)
+        .where(ConversationSummary.conversation_id == conversation_id)
+    )).first()
+    summary_text, through_message_id = summary or ("", 0)
+    unsummarized = (await session.exec(
+        select(Message.id, Message.role, Message.content)
+        .where(Message.conversation_id == conversation_id, Message.id > through_message_id)
+        .order_by(Message.id)
+    )).all()
+    return ConversationContext(conversation_id, summary_text, through_message_id, unsummarized)
+
+async def save_summary(session: AsyncSession, context: ConversationContext) -> None:
+    # Adds the upsert to the caller's transaction. Two turns may fold the same conversation at
+    # once; whichever summary reaches further wins, and neither write fails.
+    if not context.summary_changed:
+        return
+    statement = dialect_insert(session, ConversationSummary).values(
+        conversation_id=context.conversation_id,
+        summary=context.summary,
+        through_message_id=context.through_message_id,
+        updated_at=utc_now(),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ConversationSummary.conversation_id],
+        set_={name: statement.excluded[name] for name in ("summary", "through_message_id", "updated_at")},
+        where=ConversationSummary.through_message_id < statement.excluded.through_message_id,
+    )
+    await session.execute(statement)
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import uuid
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set
+
+# In-process change feed for task mutations
+FEED_BACKLOG = int(os.getenv("FEED_BACKLOG", "1000")) # Recent events kept per user for resuming
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "256")) # Undelivered events one subscriber may buffer
+
+class Subscription:
+    """
+    One client's view of a user's feed. Iterating yields events in sequence order.
+    Publishing never waits on a subscriber: if its queue fills up, the queue is emptied and
+    the subscription catches up from the user's backlog instead, or yields a reset event if
+    the events it missed have already left the backlog.
+    """
+    def __init__(self, channel: "UserChannel", since: int, reset: bool = False):
+        self.channel = channel
+        self.last_seq = since
+        self.reset = reset
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=FEED_QUEUE_SIZE)
+        self.lagging = False
+
+    def offer(self, event: Dict):
+        if self.lagging:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagging = True
+            self.drain()
+            self.queue.put_nowait(None) # Tells the reader to catch up
+
+    def drain(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    async def __aiter__(self) -> AsyncIterator[Dict]:
+        if self.reset:
+            yield {"type": "reset", "seq": self.last_seq}
+        for event in self.catch_up():
+            yield event
+        while True:
+            event = await self.queue.get()
+            if event is None:
+                for event in self.catch_up():
+                    yield event
+            elif event["seq"] > self.last_seq:
+                self.last_seq = event["seq"]
+                yield event
+
+    def catch_up(self) -> List[Dict]:
+        # Events after last_seq from the backlog, or a reset if some of them were already dropped.
+        # Anything still queued is in the backlog too, so the queue is emptied to avoid repeats.
+        channel = self.channel
+        self.drain()
+        self.lagging = False
+        if self.last_seq >= channel.seq:
+            return []
+        oldest = channel.backlog[0]["seq"] if channel.backlog else channel.seq + 1
+        if self.last_seq + 1 < oldest:
+            self.last_seq = channel.seq
+            return [{"type": "reset", "seq": channel.seq}]
+        missed = [event for event in channel.backlog if event["seq"] > self.last_seq]
+        self.last_seq = channel.seq
+        return missed
+
+class UserChannel:
+    def __init__(self):
+        self.seq = 0
+        self.backlog: Deque[Dict] = deque(maxlen=FEED_BACKLOG)
+        self.subscribers: Set[Subscription] = set()
+
+class ChangeFeed:
+    # Per-user sequence numbers start at 0 with the process; clients resuming with another
+    # epoch get a reset. Subscribers only see changes made by this process, so multiple
+    # workers need sticky routing per user or an external broker in front of this.
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.channels: Dict[str, UserChannel] = {}
+
+    def publish(self, user_id: str, changes: List[Dict]):
+        channel = self.channels.setdefault(user_id, UserChannel())
+        for change in changes:
+            channel.seq += 1
+            event = {"type": "change", "seq": channel.seq, **change}
+            channel.backlog.append(event)
+            for subscription in channel.subscribers:
+                subscription.offer(event)
+
+    def subscribe(self, user_id: str, since: Optional[int] = None, epoch: Optional[str] = None) -> Subscription:
+        """
+        Starts a subscription at `since`, the last sequence number the client has applied.
+        Without one, or with a stale epoch, the client first gets a reset and should reload
+        its task list; either way it then receives every change after that point.
+        """
+        channel = self.channels.setdefault(user_id, UserChannel())
+        if since is None or epoch != self.epoch or since > channel.seq:
+            subscription = Subscription(channel, channel.seq, reset=True)
+        else:
+            subscription = Subscription(channel, since)
+        channel.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id: str, subscription: Subscription):
+        channel = self.channels.get(user_id)
+        if channel is not None:
+            channel.subscribers.discard(subscription)
+
+task_feed = ChangeFeed()
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, insert, or_, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import async_session_maker
+from metrics import record_job_run
+from models import Job, TaskCreate, utc_now
+from services.tasks import bulk_create_tasks, discard_task_changes, publish_task_changes
+
+# Background jobs, stored in the job table so they survive restarts and any process can run them
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2")) # Jobs run at once per process; 0 only enqueues
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1")) # Seconds an idle worker waits before looking again
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5")) # Runs before a job is marked failed
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", "2")) # Seconds before the first retry; doubles each time
+JOB_RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", "300"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120")) # A running job is reclaimed once its lease runs out
+JOB_SHUTDOWN_TIMEOUT = float(os.getenv("JOB_SHUTDOWN_TIMEOUT", "10")) # Seconds shutdown waits for running jobs
+TASK_IMPORT_MAX_ITEMS = int(os.getenv("TASK_IMPORT_MAX_ITEMS", "50000")) # Largest POST /api/tasks/import
+TASK_IMPORT_BATCH_SIZE = 200 # Rows per INSERT and per commit of an import
+
+logger = logging.getLogger(__name__)
+
+JOB_COLUMNS = [Job.id, Job.user_id, Job.kind, Job.payload, Job.status, Job.attempts, Job.max_attempts,
+               Job.run_at, Job.result, Job.error, Job.created_at, Job.updated_at]
+# Returned by status polling; the payload can be large and the client sent it
+JOB_READ_FIELDS = ["id", "kind", "status", "attempts", "max_attempts", "run_at", "result", "error", "created_at", "updated_at"]
+
+class JobError(Exception):
+    """A failure retrying can't fix; the job is marked failed straight away."""
+
+class LeaseLost(Exception):
+    """Another worker has claimed the job since this run started; its writes must not commit."""
+
+JobHandler = Callable[[AsyncSession, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+# kind -> handler(session, job), where job is the claimed row (user_id, payload, result, ...).
+# Handlers don't commit: the worker commits their writes in the same transaction that marks the
+# job succeeded, so however many times a job is retried or reclaimed, its writes land once.
+# Long jobs commit in steps with checkpoint_job instead, and resume from job["result"].
+job_handlers: Dict[str, JobHandler] = {}
+
+def job_handler(kind: str):
+    def register(handler: JobHandler) -> JobHandler:
+        job_handlers[kind] = handler
+        return handler
+    return register
+
+# --- Queue ---
+
+async def enqueue_job(session: AsyncSession, user_id: str, kind: str, payload: Dict[str, Any], max_attempts: int = JOB_MAX_ATTEMPTS) -> Dict:
+    # Adds the job to the caller's transaction; once committed, call job_pool.wake() so a local worker starts now
+    now = utc_now()
+    statement = insert(Job).values(
+        user_id=user_id, kind=kind, payload=payload, status="queued", attempts=0, max_attempts=max_attempts,
+        run_at=now, created_at=now, updated_at=now,
+    ).returning(*JOB_COLUMNS)
+    return dict((await session.execute(statement)).mappings().one())
+
+async def get_job_row(session: AsyncSession, user_id: str, job_id: int) -> Optional[Dict]:
+    statement = select(*(getattr(Job, name) for name in JOB_READ_FIELDS)).where(Job.id == job_id, Job.user_id == user_id)
+    row = (await session.execute(statement)).mappings().first()
+    return dict(row) if row else None
+
+async def claim_job(session: AsyncSession) -> Optional[Dict]:
+    # One statement, so two workers never claim the same job: Postgres skips rows another claim
+    # has locked, and SQLite runs one write at a time. A running job whose lease has expired
+    # belongs to a worker that died (or overran), and is claimed again.
+    now = utc_now()
+    due = (
+        select(Job.id)
+        .where(or_(
+            and_(Job.status == "queued", Job.run_at <= now),
+            and_(Job.status == "running", Job.locked_until < now),
+        ))
+        .order_by(Job.run_at, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    statement = (
+        update(Job)
+        .where(Job.id == due)
+        .values(status="running", attempts=Job.attempts + 1, locked_until=now + timedelta(seconds=JOB_LEASE_SECONDS), updated_at=now)
+        .returning(*JOB_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    row = (await session.execute(statement)).mappings().first()
+    return dict(row) if row else None
+
+async def update_claimed_job(session: AsyncSession, job: Dict, **values):
+    # Only the claim that is still current may change the job; a worker whose lease ran out and
+    # was reclaimed gets LeaseLost and must roll back its writes
+    statement = (
+        update(Job)
+        .where(Job.id == job["id"], Job.status == "running", Job.attempts == job["attempts"])
+        .values(**values, updated_at=utc_now())
+        .returning(Job.id)
+        .execution_options(synchronize_session=False)
+    )
+    if (await session.execute(statement)).first() is None:
+        raise LeaseLost()
+
+async def checkpoint_job(session: AsyncSession, job: Dict, progress: Dict[str, Any]):
+    # Commits the handler's writes so far together with `progress`, which shows in status polling
+    # and which the next attempt finds in job["result"] to resume from. Also renews the lease.
+    await update_claimed_job(session, job, result=progress, locked_until=utc_now() + timedelta(seconds=JOB_LEASE_SECONDS))
+    await session.commit()
+    job["result"] = progress
+    await publish_task_changes(session)
+
+def retry_delay(attempts: int) -> float:
+    # Exponential backoff with jitter, so jobs that failed together don't retry together
+    return min(JOB_RETRY_MAX_DELAY, JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+async def run_next_job() -> bool:
+    """
+    Claims one due job and runs it. Returns False if there was nothing to run. The handler's writes
+    and the job's success commit together; on an exception they are rolled back and the job is
+    queued again after retry_delay, or marked failed once max_attempts runs have failed. Work a
+    handler committed with checkpoint_job stays.
+    """
+    async with async_session_maker() as session:
+        job = await claim_job(session)
+        await session.commit()
+        if job is None:
+            return False
+
+        started = time.perf_counter()
+        try:
+            handler = job_handlers.get(job["kind"])
+            if handler is None:
+                raise JobError(f"No handler for job kind {job['kind']}.")
+            if job["attempts"] > job["max_attempts"]:
+                raise JobError("The last attempt did not finish before its lease expired.")
+            result = await handler(session, job)
+            await update_claimed_job(session, job, status="succeeded", result=result, error=None, locked_until=None)
+            await session.commit()
+            outcome = "succeeded"
+        except LeaseLost:
+            # The worker that reclaimed the job owns it now
+            await session.rollback()
+            discard_task_changes(session)
+            return True
+        except Exception as error:
+            await session.rollback()
+            discard_task_changes(session)
+            message = f"{type(error).__name__}: {error}"[:1000]
+            if isinstance(error, JobError) or job["attempts"] >= job["max_attempts"]:
+                outcome, values = "failed", {"status": "failed", "error": message}
+            else:
+                run_at = utc_now() + timedelta(seconds=retry_delay(job["attempts"]))
+                outcome, values = "retried", {"status": "queued", "error": message, "run_at": run_at}
+            try:
+                await update_claimed_job(session, job, **values, locked_until=None)
+            except LeaseLost:
+                await session.rollback()
+                return True
+            await session.commit()
+        else:
+            await publish_task_changes(session)
+        record_job_run(job["kind"], outcome, time.perf_counter() - started)
+        return True
+
+class JobWorkerPool:
+    """
+    JOB_WORKERS coroutines in this process, each running one job at a time. Idle workers look for
+    due jobs every JOB_POLL_INTERVAL seconds, or straight away after wake(). Every process that
+    starts a pool shares the same table, so jobs enqueued by one may run in another.
+    """
+    def __init__(self, concurrency: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.workers: List[asyncio.Task] = []
+        self.wakeup: Optional[asyncio.Event] = None
+        self.stopping = False
+
+    def start(self):
+        # Called from the running event loop (the app's lifespan)
+        self.stopping = False
+        self.wakeup = asyncio.Event()
+        self.workers = [asyncio.create_task(self.work()) for _ in range(self.concurrency)]
+
+    def wake(self):
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def stop(self, timeout: float = JOB_SHUTDOWN_TIMEOUT):
+        # Lets running jobs finish; any still running after the timeout are cancelled, rolled back,
+        # and claimed again by some worker once their lease expires
+        self.stopping = True
+        self.wake()
+        if self.workers:
+            _, pending = await asyncio.wait(self.workers, timeout=timeout)
+            for worker in pending:
+                worker.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self.workers = []
+
+    async def work(self):
+        while not self.stopping:
+            self.wakeup.clear() # Before looking, so a wake() during the run below isn't lost
+            try:
+                ran = await run_next_job()
+            except Exception:
+                # Couldn't reach the database; the job, if one was claimed, is reclaimed after its lease
+                logger.exception("Job worker error")
+                ran = False
+            if not ran and not self.stopping:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+job_pool = JobWorkerPool()
+
+# --- Handlers ---
+
+@job_handler("task_import")
+async def run_task_import(session: AsyncSession, job: Dict[str, Any]) -> Dict[str, Any]:
+    # Commits each batch with the count so far: one transaction for the whole import would hold
+    # the write lock throughout (on SQLite, blocking other requests' reads for seconds), and a
+    # retry would start over. A failed import keeps the batches that made it, as the result says.
+    try:
+        items = [TaskCreate(**item).dict() for item in job["payload"]["tasks"]]
+    except (KeyError, TypeError, ValueError):
+        raise JobError("Each task needs a title and may have a description.")
+    created = (job["result"] or {}).get("created", 0)
+    for start in range(created, len(items), TASK_IMPORT_BATCH_SIZE):
+        created += len(await bulk_create_tasks(session, job["user_id"], items[start:start + TASK_IMPORT_BATCH_SIZE]))
+        await checkpoint_job(session, job, {"created": created, "total": len(items)})
+    return {"created": created, "total": len(items)}
@@ -0,0 +1,319 @@
+import base64
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, column, delete, func, insert, literal_column, or_, table, tuple_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import TASK_SEARCH_DOCUMENT
+from models import Task, TaskRead, utc_now
+from services.cache import task_cache
+from services.feed import task_feed
+
+# Columns a caller may ask for with fields=; anything else is rejected rather than ignored
+TASK_FIELDS = tuple(Task.__table__.columns.keys())
+TASK_COLUMNS = tuple(Task.__table__.columns)
+# Default columns for reads, matching the lean TaskRead schema
+TASK_READ_FIELDS = tuple(TaskRead.model_fields)
+
+def encode_cursor(completed: bool, task_id: int) -> str:
+    # Opaque to clients; it's just the (completed, id) sort key of the last row on the page
+    return base64.urlsafe_b64encode(f"{int(completed)}:{task_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[bool, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        completed, task_id = raw.split(":")
+        return completed == "1", int(task_id)
+    except ValueError:
+        raise ValueError("Invalid cursor.")
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in TASK_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(TASK_FIELDS)}.")
+    return names
+
+async def list_tasks_page(
+    session: AsyncSession,
+    user_id: str,
+    status_filter: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    fields: Optional[Sequence[str]] = None,
+    updated_since: Optional[datetime] = None,
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Returns one page of a user's tasks ordered by (completed, id), plus the cursor for the next page
+    (None on the last page). The WHERE and ORDER BY match the (user_id, completed, id) index, so each
+    page is an index range scan no matter how deep into the list it is.
+    With updated_since, only tasks created or changed after that time are returned, for clients
+    syncing incrementally; deletions are not visible this way and come from the change feed.
+    """
+    names = list(fields or TASK_READ_FIELDS)
+    # The sort key is always selected so the next cursor can be built, even if it isn't returned
+    columns = [getattr(Task, name) for name in dict.fromkeys([*names, "completed", "id"])]
+    query = select(*columns).where(Task.user_id == user_id)
+    if status_filter == "pending":
+        query = query.where(Task.completed == False)
+    elif status_filter == "completed":
+        query = query.where(Task.completed == True)
+    if updated_since is not None:
+        query = query.where(Task.updated_at > updated_since)
+    if cursor:
+        query = query.where(tuple_(Task.completed, Task.id) > decode_cursor(cursor))
+    # One extra row tells us whether there is another page without a COUNT
+    query = query.order_by(Task.completed, Task.id).limit(limit + 1)
+
+    rows = (await session.execute(query)).mappings().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["completed"], rows[-1]["id"])
+    return [{name: row[name] for name in names} for row in rows], next_cursor
+
+# --- Search ---
+
+def search_terms(query: str) -> List[str]:
+    # Letters and digits only, so user input can never be parsed as FTS5/tsquery syntax
+    return re.findall(r"[^\W_]+", query.lower())[:16]
+
+async def search_tasks(
+    session: AsyncSession,
+    user_id: str,
+    query: str,
+    status_filter: Optional[str] = None,
+    limit: int = 20,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Dict]:
+    """
+    Best matches first for `query` in the user's task titles and descriptions. Every term must
+    match, as a word prefix ("groc" finds "groceries"). Uses the FTS5 table on SQLite and the
+    GIN-indexed tsvector on Postgres; other databases fall back to an unindexed LIKE scan.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    names = list(fields or TASK_READ_FIELDS)
+    statement = select(*(getattr(Task, name) for name in names)).where(Task.user_id == user_id)
+    if status_filter == "pending":
+        statement = statement.where(Task.completed == False)
+    elif status_filter == "completed":
+        statement = statement.where(Task.completed == True)
+
+    backend = session.bind.dialect.name
+    if backend == "sqlite":
+        task_fts = table("task_fts", column("rowid"))
+        match = " ".join(f'"{term}"*' for term in terms)
+        statement = (
+            statement.join(task_fts, task_fts.c.rowid == Task.id)
+            .where(literal_column("task_fts").op("MATCH")(match))
+            .order_by(func.bm25(literal_column("task_fts")), Task.id) # bm25: lower is better
+        )
+    elif backend == "postgresql":
+        document = literal_column(TASK_SEARCH_DOCUMENT)
+        tsquery = func.to_tsquery(literal_column("'english'"), " & ".join(f"{term}:*" for term in terms))
+        statement = statement.where(document.op("@@")(tsquery)).order_by(func.ts_rank(document, tsquery).desc(), Task.id)
+    else:
+        for term in terms:
+            pattern = f"%{term}%"
+            statement = statement.where(or_(Task.title.ilike(pattern), Task.description.ilike(pattern)))
+        statement = statement.order_by(Task.id)
+
+    rows = (await session.execute(statement.limit(limit))).mappings().all()
+    return [dict(row) for row in rows]
+
+async def get_task_row(session: AsyncSession, user_id: str, task_id: int) -> Optional[Dict]:
+    statement = select(*(getattr(Task, name) for name in TASK_READ_FIELDS)).where(Task.id == task_id, Task.user_id == user_id)
+    row = (await session.execute(statement)).mappings().first()
+    return dict(row) if row else None
+
+# --- Cached reads ---
+# Keyed by user, then by status filter and page. Every write path calls
+# publish_task_changes after it commits, which invalidates the user's entries.
+
+async def cached_tasks_page(
+    session: AsyncSession,
+    user_id: str,
+    status_filter: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    fields: Optional[Sequence[str]] = None,
+    updated_since: Optional[datetime] = None,
+) -> Tuple[List[Dict], Optional[str]]:
+    async def load():
+        tasks, next_cursor = await list_tasks_page(session, user_id, status_filter, cursor, limit, fields, updated_since)
+        return {"tasks": tasks, "next_cursor": next_cursor}
+
+    since = updated_since.isoformat() if updated_since else None
+    key = ("list", status_filter or "all", cursor, limit, tuple(fields or ()), since)
+    page = await task_cache.get_or_load(user_id, key, load)
+    return page["tasks"], page["next_cursor"]
+
+async def cached_search(
+    session: AsyncSession,
+    user_id: str,
+    query: str,
+    status_filter: Optional[str] = None,
+    limit: int = 20,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Dict]:
+    key = ("search", " ".join(search_terms(query)), status_filter or "all", limit, tuple(fields or ()))
+    return await task_cache.get_or_load(user_id, key, lambda: search_tasks(session, user_id, query, status_filter, limit, fields))
+
+async def cached_task(session: AsyncSession, user_id: str, task_id: int) -> Optional[Dict]:
+    return await task_cache.get_or_load(user_id, ("task", task_id), lambda: get_task_row(session, user_id, task_id))
+
+# --- Change notification ---
+# Mutations record what they changed on the session; once the caller has committed,
+# publish_task_changes invalidates the read cache and pushes the changes to the feed.
+# A rolled-back transaction must call discard_task_changes so nothing is announced.
+
+def record_task_change(session: AsyncSession, user_id: str, op: str, task: Optional[Dict] = None, task_id: Optional[int] = None):
+    change = {"op": op, "task": task} if task is not None else {"op": op, "id": task_id}
+    session.info.setdefault("task_changes", []).append((user_id, change))
+
+def discard_task_changes(session: AsyncSession):
+    session.info.pop("task_changes", None)
+
+async def publish_task_changes(session: AsyncSession):
+    by_user: Dict[str, List[Dict]] = {}
+    for user_id, change in session.info.pop("task_changes", []):
+        by_user.setdefault(user_id, []).append(change)
+    for user_id, changes in by_user.items():
+        await task_cache.invalidate(user_id)
+        task_feed.publish(user_id, changes)
+
+# --- Single-task mutations ---
+# One statement each: the WHERE clause checks ownership and RETURNING hands back the row,
+# so there is no SELECT before the write and no refresh after it. None means no task
+# with that id belongs to the user, which callers turn into a 404 or a tool error.
+
+async def create_task_row(session: AsyncSession, user_id: str, title: str, description: Optional[str] = None) -> Dict:
+    now = utc_now()
+    statement = insert(Task).values(
+        user_id=user_id, title=title, description=description, completed=False, created_at=now, updated_at=now
+    ).returning(*TASK_COLUMNS)
+    task = dict((await session.execute(statement)).mappings().one())
+    record_task_change(session, user_id, "created", task)
+    return task
+
+async def update_task_row(session: AsyncSession, user_id: str, task_id: int, **values) -> Optional[Dict]:
+    statement = (
+        update(Task)
+        .where(Task.id == task_id, Task.user_id == user_id)
+        .values(**values, updated_at=utc_now())
+        .returning(*TASK_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    row = (await session.execute(statement)).mappings().first()
+    if not row:
+        return None
+    task = dict(row)
+    record_task_change(session, user_id, "updated", task)
+    return task
+
+async def delete_task_row(session: AsyncSession, user_id: str, task_id: int) -> bool:
+    statement = (
+        delete(Task)
+        .where(Task.id == task_id, Task.user_id == user_id)
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    if (await session.execute(statement)).first() is None:
+        return False
+    record_task_change(session, user_id, "deleted", task_id=task_id)
+    return True
+
+# --- Bulk operations ---
+# Each runs as one set-based statement and never commits; the caller does, so a whole
+# batch lands in a single transaction. Results come back in input order, one per item.
+
+BULK_MAX_ITEMS = 1000 # Largest batch one request or tool call may carry
+
+async def bulk_create_tasks(session: AsyncSession, user_id: str, items: Sequence[Dict]) -> List[Dict]:
+    if not items:
+        return []
+    now = utc_now()
+    rows = [
+        {"user_id": user_id, "title": item["title"], "description": item.get("description"),
+         "completed": False, "created_at": now, "updated_at": now}
+        for item in items
+    ]
+    # One multi-row INSERT ... RETURNING. RETURNING order isn't guaranteed, but ids are assigned
+    # in VALUES order within a statement, so sorting by id restores the request order.
+    statement = insert(Task).values(rows).returning(*TASK_COLUMNS)
+    created = sorted((await session.execute(statement)).mappings(), key=lambda row: row["id"])
+    for row in created:
+        record_task_change(session, user_id, "created", dict(row))
+    return [{"id": row["id"], "status": "created", "task": dict(row)} for row in created]
+
+async def bulk_update_tasks(session: AsyncSession, user_id: str, items: Sequence[Dict]) -> List[Dict]:
+    if not items:
+        return []
+    # Items carry only the fields the client set, as PUT does: a null description clears it, while
+    # title and completed can't be null and are left alone. Later entries for the same id win, as
+    # if the updates had been applied one by one.
+    changes: Dict[int, Dict] = {}
+    for item in items:
+        changes.setdefault(item["id"], {}).update(
+            {key: value for key, value in item.items() if key != "id" and (value is not None or key == "description")}
+        )
+
+    # One UPDATE ... WHERE id IN (...), with a CASE per column for rows that change it
+    values = {"updated_at": utc_now()}
+    for column in ("title", "description", "completed"):
+        per_id = {task_id: fields[column] for task_id, fields in changes.items() if column in fields}
+        if per_id:
+            values[column] = case(per_id, value=Task.id, else_=getattr(Task, column))
+    statement = (
+        update(Task)
+        .where(Task.user_id == user_id, Task.id.in_(changes))
+        .values(**values)
+        .returning(*TASK_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    updated = {row["id"]: dict(row) for row in (await session.execute(statement)).mappings()}
+    for task in updated.values():
+        record_task_change(session, user_id, "updated", task)
+    return [item_result(item["id"], updated, "updated") for item in items]
+
+async def bulk_complete_tasks(session: AsyncSession, user_id: str, ids: Sequence[int], completed: bool = True) -> List[Dict]:
+    if not ids:
+        return []
+    statement = (
+        update(Task)
+        .where(Task.user_id == user_id, Task.id.in_(set(ids)))
+        .values(completed=completed, updated_at=utc_now())
+        .returning(*TASK_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    updated = {row["id"]: dict(row) for row in (await session.execute(statement)).mappings()}
+    for task in updated.values():
+        record_task_change(session, user_id, "updated", task)
+    return [item_result(task_id, updated, "updated") for task_id in ids]
+
+async def bulk_delete_tasks(session: AsyncSession, user_id: str, ids: Sequence[int]) -> List[Dict]:
+    if not ids:
+        return []
+    statement = (
+        delete(Task)
+        .where(Task.user_id == user_id, Task.id.in_(set(ids)))
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = set((await session.execute(statement)).scalars())
+    for task_id in deleted:
+        record_task_change(session, user_id, "deleted", task_id=task_id)
+    return [{"id": task_id, "status": "deleted" if task_id in deleted else "not_found"} for task_id in ids]
+
+def item_result(task_id: int, rows: Dict[int, Dict], status: str) -> Dict:
+    # Ids that matched no row (missing, or owned by another user) are reported, not raised
+    if task_id not in rows:
+        return {"id": task_id, "status": "not_found"}
+    return {"id": task_id, "status": status, "task": rows[task_id]}
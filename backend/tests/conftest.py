@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# Settings are read at import time, so the scratch database must be chosen before any backend module loads
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.setdefault("OPENAI_API_KEY", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from db import create_db_and_tables
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    create_db_and_tables()
@@ -0,0 +1,32 @@
+import asyncio
+
+from db import async_session_maker
+from models import TaskBulkUpdate
+from services.tasks import bulk_create_tasks, bulk_update_tasks
+
+def apply_updates(*updates):
+    async def run():
+        async with async_session_maker() as session:
+            [created] = await bulk_create_tasks(session, "bulk_user", [{"title": "Original", "description": "Notes"}])
+            task_id = created["id"]
+            results = await bulk_update_tasks(
+                session, "bulk_user", [TaskBulkUpdate(id=task_id, **update).dict(exclude_unset=True) for update in updates]
+            )
+            await session.commit()
+            return results[-1]["task"]
+    return asyncio.run(run())
+
+def test_null_description_clears_it():
+    task = apply_updates({"description": None})
+    assert task["description"] is None
+    assert task["title"] == "Original"
+
+def test_omitted_fields_are_left_alone():
+    task = apply_updates({"completed": True})
+    assert task["description"] == "Notes"
+    assert task["completed"] is True
+
+def test_null_title_is_ignored_and_later_entries_win():
+    task = apply_updates({"title": None}, {"title": "Renamed"}, {"description": "First"}, {"description": "Second"})
+    assert task["title"] == "Renamed"
+    assert task["description"] == "Second"
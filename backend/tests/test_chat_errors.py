@@ -0,0 +1,29 @@
+import asyncio
+
+import httpx
+import pytest
+
+import routes.chat as chat
+from main import app
+from services.ai import AIError, AITimeoutError
+
+def post(path):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(path, json={"message": "hello"})
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("error, status_code", [(AITimeoutError("slow"), 504), (AIError("bad key"), 502)])
+def test_chat_maps_model_errors_to_gateway_statuses(monkeypatch, error, status_code):
+    async def failing(**kwargs):
+        raise error
+    monkeypatch.setattr(chat, "get_ai_response", failing)
+    assert post("/api/chat/").status_code == status_code
+
+def test_stream_reports_model_errors_as_an_error_event(monkeypatch):
+    async def failing(**kwargs):
+        raise AIError("bad key")
+        yield
+    monkeypatch.setattr(chat, "stream_ai_response", failing)
+    response = post("/api/chat/stream")
+    assert response.status_code == 200 and "event: error" in response.text
@@ -0,0 +1,54 @@
+import asyncio
+
+from services.cache import RedisCacheBackend, TaskCache
+
+class FakeRedis:
+    # The slice of redis.asyncio RedisCacheBackend uses, over plain dicts
+    def __init__(self):
+        self.hashes = {}
+
+    async def hmget(self, name, *fields):
+        return [self.hashes.get(name, {}).get(field) for field in fields]
+
+    async def hsetnx(self, name, field, value):
+        self.hashes.setdefault(name, {}).setdefault(field, value.encode())
+
+    async def hincrby(self, name, field, amount):
+        fields = self.hashes.setdefault(name, {})
+        fields[field] = str(int(fields.get(field, 0)) + amount).encode()
+
+    async def hget(self, name, field):
+        return self.hashes.get(name, {}).get(field)
+
+    async def hset(self, name, field, value):
+        self.hashes.setdefault(name, {})[field] = value.encode()
+
+    async def expire(self, name, seconds):
+        pass
+
+    def flushall(self):
+        self.hashes.clear()
+
+def test_versions_after_a_redis_flush_never_match_earlier_ones():
+    async def run():
+        client = FakeRedis()
+        cache = TaskCache(RedisCacheBackend(client))
+        seen = [await cache.version("u")]
+        await cache.invalidate("u")
+        seen.append(await cache.version("u"))
+        assert await cache.get_or_load("u", "page", lambda: asyncio.sleep(0, ["before"])) == ["before"]
+
+        client.flushall()
+        assert await cache.version("u") not in seen
+        await cache.invalidate("u")
+        assert await cache.version("u") not in seen
+        assert await cache.get_or_load("u", "page", lambda: asyncio.sleep(0, ["after"])) == ["after"]
+    asyncio.run(run())
+
+def test_processes_sharing_redis_agree_on_the_version():
+    async def run():
+        client = FakeRedis()
+        first, second = TaskCache(RedisCacheBackend(client)), TaskCache(RedisCacheBackend(client))
+        await first.invalidate("u")
+        assert await first.version("u") == await second.version("u")
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import pytest
+
+import services.ai as ai
+from db import async_session_maker
+from services.ai import execute_tool_calls, parse_tool_arguments
+
+def run_round(*calls):
+    async def run():
+        async with async_session_maker() as session:
+            return await execute_tool_calls(session, "tool_user", [(name, json.dumps(args)) for name, args in calls])
+    return asyncio.run(run())
+
+def test_arguments_are_coerced_to_the_schema_types():
+    args = parse_tool_arguments("get_tasks_tool", '{"limit": "10", "cursor": null}', "tool_user")
+    assert args == {"limit": 10, "user_id": "tool_user"}
+
+def test_user_id_is_always_the_requesting_user():
+    args = parse_tool_arguments("delete_task_tool", '{"task_id": 3, "user_id": "someone_else"}', "tool_user")
+    assert args["user_id"] == "tool_user"
+
+@pytest.mark.parametrize("name, arguments", [
+    ("delete_tasks_tool", '{"task_ids": null}'),
+    ("delete_tasks_tool", '{"task_ids": "1,2"}'),
+    ("mark_task_complete_tool", '{"task_id": "first"}'),
+    ("get_tasks_tool", '{"status": "done"}'),
+    ("create_task_tool", "{}"),
+    ("create_task_tool", "[1, 2]"),
+    ("create_task_tool", "{not json"),
+])
+def test_invalid_arguments_are_rejected(name, arguments):
+    with pytest.raises(ValueError):
+        parse_tool_arguments(name, arguments, "tool_user")
+
+def test_wrong_typed_read_runs_with_coerced_value():
+    [result] = run_round(("get_tasks_tool", {"limit": "10"}))
+    assert "tasks" in result
+
+def test_invalid_arguments_go_back_to_the_model_and_other_calls_still_run():
+    results = run_round(
+        ("delete_tasks_tool", {"task_ids": None}),
+        ("mark_task_complete_tool", {"task_id": "first"}),
+        ("create_task_tool", {"title": "Still created"}),
+    )
+    assert results[0]["error"].startswith("Invalid arguments for delete_tasks_tool: task_ids")
+    assert results[1]["error"].startswith("Invalid arguments for mark_task_complete_tool: task_id")
+    assert results[2]["title"] == "Still created"
+
+def test_a_failing_write_keeps_the_rest_of_the_round(monkeypatch, caplog):
+    async def broken_tool(session, task_id, user_id):
+        await ai.create_task_row(session, user_id, "Rolled back", "")
+        raise RuntimeError("database went away")
+
+    monkeypatch.setitem(ai.available_tools, "delete_task_tool", broken_tool)
+    results = run_round(
+        ("create_task_tool", {"title": "Before the failure"}),
+        ("delete_task_tool", {"task_id": 1}),
+        ("create_task_tool", {"title": "After the failure"}),
+    )
+    assert "error" in results[1]
+    [record] = [record for record in caplog.records if record.name == "services.ai"]
+    assert record.levelname == "WARNING" and "delete_task_tool" in record.getMessage()
+    [listed] = run_round(("get_tasks_tool", {}))
+    titles = [task["title"] for task in listed["tasks"]]
+    assert "Before the failure" in titles and "After the failure" in titles
+    assert "Rolled back" not in titles
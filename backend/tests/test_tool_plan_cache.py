@@ -0,0 +1,31 @@
+import asyncio
+import json
+
+from db import async_session_maker
+from services.ai import ToolPlanCache, execute_tool_calls, plan_message
+from services.tasks import bulk_create_tasks
+
+def model_calls(user_id):
+    # What the model sends: every tool schema asks for user_id, so it fills in the current user's
+    return [("get_tasks_tool", json.dumps({"status": "pending", "user_id": user_id}))]
+
+def test_plan_recorded_for_one_user_replays_for_another_without_their_id():
+    cache = ToolPlanCache(min_seen=2)
+    cache.record("show my pending tasks", model_calls("plan_user_alice"))
+    # A second user choosing the same plan counts towards reuse, since the plans are equal
+    cache.record("show my pending tasks", model_calls("plan_user_carol"))
+    plan = cache.get("Show my pending tasks, please")
+    assert plan is not None
+
+    # What user B's prompt and tool_call events are built from
+    replayed = json.dumps([plan, plan_message(plan)])
+    assert "alice" not in replayed and "carol" not in replayed and "user_id" not in replayed
+
+    async def run():
+        async with async_session_maker() as session:
+            await bulk_create_tasks(session, "plan_user_alice", [{"title": "Alice's task"}])
+            await bulk_create_tasks(session, "plan_user_bob", [{"title": "Bob's task"}])
+            await session.commit()
+            return await execute_tool_calls(session, "plan_user_bob", list(plan))
+    [result] = asyncio.run(run())
+    assert [task["title"] for task in result["tasks"]] == ["Bob's task"]
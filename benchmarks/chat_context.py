@@ -0,0 +1,72 @@
+"""Show that chat prompt size and latency stay bounded over long conversations.
+
+Drives one conversation through POST /api/chat/ for --turns turns against the
+stub OpenAI server and reports, per block of turns, the prompt tokens sent with
+each chat completion, the number of summary calls and the request latency.
+
+Usage: python benchmarks/chat_context.py [--turns 500] [--block 50]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from stub_openai import StubOpenAIServer
+
+USER_MESSAGE = "Please add a task to review the quarterly report and remind me about the dentist appointment. " * 2
+REPLY = "I've added the task and noted the reminder. Anything else you want me to track for this week? " * 3
+
+
+async def run(args, app, stub):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    rows = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        conversation_id = None
+        for block_start in range(0, args.turns, args.block):
+            latencies = []
+            log_start = len(stub.prompt_log)
+            for _ in range(min(args.block, args.turns - block_start)):
+                started = time.perf_counter()
+                response = await client.post("/api/chat/", json={"message": USER_MESSAGE, "conversation_id": conversation_id})
+                latencies.append((time.perf_counter() - started) * 1000)
+                conversation_id = response.json()["conversation_id"]
+            prompts = [tokens for used_tools, tokens in stub.prompt_log[log_start:] if used_tools]
+            summaries = sum(1 for used_tools, _ in stub.prompt_log[log_start:] if not used_tools)
+            rows.append((block_start + 1, block_start + len(latencies), statistics.mean(prompts), max(prompts),
+                         summaries, statistics.median(latencies)))
+
+    print(f"{'turns':>11} {'mean prompt tok':>16} {'max prompt tok':>15} {'summaries':>10} {'p50 ms':>8}")
+    for first, last, mean_prompt, max_prompt, summaries, p50 in rows:
+        print(f"{first:>5}-{last:<5} {mean_prompt:>16.0f} {max_prompt:>15} {summaries:>10} {p50:>8.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--block", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    stub = StubOpenAIServer(delay=0, reply=REPLY.strip()).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'context.db')}"
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+        import main as backend_main
+        from db import create_db_and_tables
+
+        create_db_and_tables()
+        try:
+            asyncio.run(run(args, backend_main.app, stub))
+        finally:
+            stub.stop()
+
+
+if __name__ == "__main__":
+    main()
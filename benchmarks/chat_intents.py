@@ -0,0 +1,99 @@
+"""Show what the tool plan cache saves on repeated chat requests.
+
+Sends --turns chat messages, cycling through a few phrasings of "show my pending
+tasks", to POST /api/chat/ against the stub OpenAI server. The stub answers the
+first round of every turn with a get_tasks_tool call and the next round with
+text. The run is done twice, with the cache disabled and then enabled, and reports
+model requests per turn, turn latency and the cache's hit rate. A task is added
+between turns so hits can be checked for fresh results.
+
+Usage: python benchmarks/chat_intents.py [--turns 50] [--delay 0.2]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from stub_openai import StubOpenAIServer
+
+PHRASINGS = [
+    "Show my pending tasks",
+    "show my pending tasks please",
+    "Can you show my pending tasks?",
+    "SHOW MY PENDING TASKS!",
+]
+
+
+async def run_turns(client, stub, turns):
+    requests_before = stub.requests
+    latencies = []
+    for i in range(turns):
+        await client.post("/api/tasks/", json={"title": f"Added before turn {i}"})
+        started = time.perf_counter()
+        response = await client.post("/api/chat/", json={"message": PHRASINGS[i % len(PHRASINGS)]})
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"chat failed: {response.status_code} {response.text}")
+    return (stub.requests - requests_before) / turns, latencies
+
+
+async def run(args, app, stub, tool_plan_cache):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    rows = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        for name, min_seen in (("cache off", args.turns + 1), ("cache on", 2)):
+            tool_plan_cache.clear()
+            tool_plan_cache.min_seen = min_seen
+            per_turn, latencies = await run_turns(client, stub, args.turns)
+            rows.append((name, per_turn, statistics.mean(latencies), tool_plan_cache.stats()["hit_rate"]))
+
+        # A hit must still see the data as it is now: add a task, replay, and look for it in the tool
+        # result. The runs left more tasks than one get_tasks_tool page holds, so clear them first;
+        # otherwise the new task is past the page whatever the cache does.
+        ids = [task["id"] for task in (await client.get("/api/tasks/export")).json()]
+        for start in range(0, len(ids), 1000):
+            (await client.post("/api/tasks/bulk/delete", json={"ids": ids[start:start + 1000]})).raise_for_status()
+        await client.post("/api/tasks/", json={"title": "Fresh after caching"})
+        hits = tool_plan_cache.hits
+        response = await client.post("/api/chat/stream", json={"message": PHRASINGS[0]})
+        fresh = tool_plan_cache.hits == hits + 1 and "Fresh after caching" in response.text
+    return rows, fresh
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.2, help="stub model latency in seconds")
+    args = parser.parse_args(argv)
+
+    stub = StubOpenAIServer(delay=args.delay, tool_rounds=[[("get_tasks_tool", {"status": "pending"})]]).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'intents.db')}"
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+        import main as backend_main
+        from db import create_db_and_tables
+        from services.ai import tool_plan_cache
+
+        create_db_and_tables()
+        try:
+            rows, fresh = asyncio.run(run(args, backend_main.app, stub, tool_plan_cache))
+        finally:
+            stub.stop()
+
+    print(f"{args.turns} turns per run, stub delay {args.delay}s")
+    print(f"{'run':<10} {'model calls/turn':>16} {'mean ms':>9} {'hit rate':>9}")
+    for name, per_turn, mean_ms, hit_rate in rows:
+        print(f"{name:<10} {per_turn:>16.2f} {mean_ms:>9.1f} {hit_rate:>9.0%}")
+    print(f"cache hit saw a task added after caching: {'yes' if fresh else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
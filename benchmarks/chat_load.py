@@ -0,0 +1,101 @@
+"""Show that task CRUD latency stays flat while chat requests wait on the model.
+
+Runs the FastAPI app in-process against a temporary SQLite database and the
+stub OpenAI server, so no network or API key is needed. Also reports the most
+database connections checked out at once: chat requests should only hold one
+around their short transactions, not while the model generates, so --chats can
+go well past the pool size (--delay should outlast the CRUD rounds).
+
+Usage: python benchmarks/chat_load.py [--chats 8] [--delay 1.0] [--crud-rounds 50]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from stub_openai import StubOpenAIServer
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def crud_round(client):
+    started = time.perf_counter()
+    created = (await client.post("/api/tasks/", json={"title": "load test"})).json()
+    await client.get("/api/tasks/", params={"status_filter": "pending"})
+    await client.patch(f"/api/tasks/{created['id']}/complete")
+    return (time.perf_counter() - started) * 1000
+
+
+async def measure_crud(client, rounds):
+    return [await crud_round(client) for _ in range(rounds)]
+
+
+async def run(args, app, pool_usage):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        idle = await measure_crud(client, args.crud_rounds)
+
+        started = time.perf_counter()
+        chats = [asyncio.create_task(client.post("/api/chat/", json={"message": "hello"}))
+                 for _ in range(args.chats)]
+        await asyncio.sleep(0.05) # let the chat requests reach the model call
+        busy = await measure_crud(client, args.crud_rounds)
+        await asyncio.sleep(max(0.0, args.delay / 2 - (time.perf_counter() - started)))
+        held = pool_usage["current"] # Mid-generation, with the CRUD rounds done
+        responses = await asyncio.gather(*chats)
+
+    failed = sum(1 for response in responses if response.status_code != 200)
+    print(f"{'phase':<18} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name, samples in (("idle", idle), (f"{args.chats} chats in flight", busy)):
+        print(f"{name:<18} {percentile(samples, 50):>8.1f} {percentile(samples, 99):>8.1f} "
+              f"{statistics.mean(samples):>8.1f}")
+    print(f"chat requests: {len(responses)} ({failed} failed)")
+    print(f"connections checked out: {held} mid-generation, {pool_usage['peak']} at peak")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=1.0, help="stub model latency in seconds")
+    parser.add_argument("--crud-rounds", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    stub = StubOpenAIServer(delay=args.delay).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+        import main as backend_main
+        from sqlalchemy import event
+        from db import async_engine, create_db_and_tables
+
+        create_db_and_tables()
+        pool_usage = {"current": 0, "peak": 0}
+
+        @event.listens_for(async_engine.sync_engine, "checkout")
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            pool_usage["current"] += 1
+            pool_usage["peak"] = max(pool_usage["peak"], pool_usage["current"])
+
+        @event.listens_for(async_engine.sync_engine, "checkin")
+        def checkin(dbapi_connection, connection_record):
+            pool_usage["current"] -= 1
+
+        try:
+            asyncio.run(run(args, backend_main.app, pool_usage))
+        finally:
+            stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Compare request latency for heavy writes done in the request and through the job queue.
+
+Imports: --tasks tasks sent as POST /api/tasks/bulk requests of 1000 (the request
+holds until every row is written) against one POST /api/tasks/import, which returns
+202 once the job is queued; the job's completion is then polled on /api/jobs/{id}.
+
+Chat: --turns turns against the stub OpenAI server, each asking create_tasks_tool
+to add --tool-tasks tasks, with AI_BACKGROUND_WRITES off and on.
+
+Usage: python benchmarks/job_queue.py [--tasks 20000] [--turns 20] [--tool-tasks 200]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from stub_openai import StubOpenAIServer
+
+
+async def wait_for_job(client, job_id):
+    while True:
+        job = (await client.get(f"/api/jobs/{job_id}")).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+
+
+async def run(args, backend_main, ai):
+    import httpx
+
+    rows = []
+    items = [{"title": f"Imported {i}", "description": "From the benchmark"} for i in range(args.tasks)]
+    async with backend_main.lifespan(backend_main.app):
+        transport = httpx.ASGITransport(app=backend_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            started = time.perf_counter()
+            for start in range(0, len(items), 1000):
+                (await client.post("/api/tasks/bulk", json=items[start:start + 1000])).raise_for_status()
+            elapsed = time.perf_counter() - started
+            rows.append(("import via /tasks/bulk", elapsed * 1000, elapsed * 1000))
+
+            started = time.perf_counter()
+            response = await client.post("/api/tasks/import", json=items)
+            accepted = time.perf_counter() - started
+            job = await wait_for_job(client, response.json()["job_id"])
+            if job["status"] != "succeeded":
+                raise RuntimeError(f"import job failed: {job['error']}")
+            rows.append(("import via /tasks/import", accepted * 1000, (time.perf_counter() - started) * 1000))
+
+            for background in (False, True):
+                ai.AI_BACKGROUND_WRITES = background
+                latencies = []
+                for i in range(args.turns):
+                    started = time.perf_counter()
+                    (await client.post("/api/chat/", json={"message": f"Add my list {i}"})).raise_for_status()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                label = "chat turn, writes " + ("queued" if background else "in request")
+                rows.append((label, statistics.median(latencies), None))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--tool-tasks", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    tool_tasks = [{"title": f"Listed {i}"} for i in range(args.tool_tasks)]
+    stub = StubOpenAIServer(delay=0, tool_rounds=[[("create_tasks_tool", {"tasks": tool_tasks})]]).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'jobs.db')}"
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+        import main as backend_main
+        import services.ai as ai
+
+        try:
+            rows = asyncio.run(run(args, backend_main, ai))
+        finally:
+            stub.stop()
+
+    print(f"{args.tasks} imported tasks; {args.turns} chat turns of {args.tool_tasks} tasks each")
+    print(f"{'path':<34} {'response ms':>12} {'done ms':>10}")
+    for label, response_ms, done_ms in rows:
+        done = f"{done_ms:>10.1f}" if done_ms is not None else f"{'-':>10}"
+        print(f"{label:<34} {response_ms:>12.1f} {done}")
+    print("(chat rows: median turn)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Break down backend cold-start time by import and startup phase.
+
+Starts the backend --runs times in fresh interpreters for each STARTUP_MODE, against
+a temporary SQLite database (already migrated for production, as the release step
+would), and reports:
+
+  ready        wall time from spawning the interpreter to the app being ready to serve
+  import       importing main (the app and everything it pulls in)
+  phases       the lifespan's own steps: create_tables in development; schema_check,
+               pool_warm and gc_freeze in production
+  first_chat   time a chat arriving as soon as the app is ready spends getting the AI
+               client (in production, whatever is left of the background SDK import)
+
+plus the cumulative import time of each module main imports directly, from
+python -X importtime, so a dependency that starts loading eagerly shows up by name.
+Each figure is the median of --runs starts.
+
+Usage: python benchmarks/startup_time.py [--runs 5] [--modes development,production] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "backend")
+MODES = ["development", "production"]
+
+# Runs in the child, from backend/: start the app, then build the AI client as the first chat would
+BOOT = """
+import asyncio, json, os, sys, time
+import main
+from metrics import startup_phases
+from services.ai import get_openai_client
+
+async def boot():
+    async with main.lifespan(main.app):
+        ready = time.time() - float(os.environ["BOOT_SPAWNED"])
+        started = time.perf_counter()
+        get_openai_client()
+        first_chat = time.perf_counter() - started
+        print(json.dumps({"ready": ready, **startup_phases, "first_chat": first_chat}))
+
+asyncio.run(boot())
+"""
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def direct_imports(importtime_output, parent="main"):
+    # -X importtime lists each module after the ones it imported, indented two spaces per level;
+    # the level-1 entries before `parent` at level 0 are what it imported directly
+    children = {}
+    pending = {}
+    for line in importtime_output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)) // 2, match.group(4)
+        if indent == 1:
+            pending[name] = cumulative / 1e6
+        elif indent == 0:
+            if name == parent:
+                children = pending
+            pending = {}
+    return children
+
+
+def cold_start(mode, database_url, importtime=False):
+    env = {**os.environ, "STARTUP_MODE": mode, "DATABASE_URL": database_url, "BOOT_SPAWNED": repr(time.time())}
+    env.setdefault("OPENAI_API_KEY", "stub")
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", BOOT]
+    completed = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{mode} start failed:\n{completed.stderr}")
+    phases = json.loads(completed.stdout.strip().splitlines()[-1])
+    return phases, direct_imports(completed.stderr) if importtime else {}
+
+
+def prepare_database(mode, directory):
+    database_url = f"sqlite:///{os.path.join(directory, f'{mode}.db')}"
+    if mode == "production":
+        env = {**os.environ, "DATABASE_URL": database_url}
+        subprocess.run([sys.executable, "migrations.py"], cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    return database_url
+
+
+def measure(modes, runs):
+    # {mode: {"phases": {phase: [seconds per run]}, "imports": {module: [seconds per run]}}}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in modes:
+            database_url = prepare_database(mode, tmp)
+            cold_start(mode, database_url) # Creates the development tables; later starts find them
+            phases, imports = {}, {}
+            for _ in range(runs):
+                # importtime's own bookkeeping slows imports down, so timings come from plain runs
+                for phase, seconds in cold_start(mode, database_url)[0].items():
+                    phases.setdefault(phase, []).append(seconds)
+                for module, seconds in cold_start(mode, database_url, importtime=True)[1].items():
+                    imports.setdefault(module, []).append(seconds)
+            results[mode] = {"phases": phases, "imports": imports}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated STARTUP_MODE values")
+    parser.add_argument("--top", type=int, default=10, help="direct imports of main to list")
+    parser.add_argument("--output", help="write the medians to a JSON file")
+    args = parser.parse_args(argv)
+
+    results = measure(args.modes.split(","), args.runs)
+    report = {}
+    for mode, result in results.items():
+        phases = {phase: statistics.median(values) for phase, values in result["phases"].items()}
+        imports = {module: statistics.median(values) for module, values in result["imports"].items()}
+        report[mode] = {"phases": phases, "imports": imports}
+
+        print(f"{mode} (median of {args.runs} starts)")
+        for phase, seconds in phases.items():
+            print(f"  {phase:<16} {seconds * 1000:>8.1f} ms")
+        print("  imported by main (cumulative, under -X importtime):")
+        for module, seconds in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {module:<28} {seconds * 1000:>8.1f} ms")
+        print()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Minimal OpenAI-compatible chat completions server for local load tests.
+
+Usage: python benchmarks/stub_openai.py [--port 8081] [--delay 0.5]
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8081/v1.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubOpenAIServer:
+    # Answers /v1/chat/completions after `delay` seconds, standing in for generation time
+    # without any network access. `tool_rounds` scripts tool calls: round N (counted
+    # from the last user message) returns the (name, arguments) calls in
+    # tool_rounds[N]; once the script runs out, or tools are disabled, it replies with
+    # `reply`.
+    def __init__(self, host="127.0.0.1", port=0, delay=0.5, reply="Stub reply.", tool_rounds=None):
+        self.delay = delay
+        self.reply = reply
+        self.tool_rounds = tool_rounds or []
+        self.requests = 0
+        self.prompt_log = [] # (offered tools?, estimated prompt tokens) per request, in arrival order
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def planned_tool_calls(self, body):
+        if body.get("tool_choice") == "none" or not body.get("tools"):
+            return []
+        rounds = 0
+        for message in reversed(body.get("messages", [])):
+            if message.get("role") == "user":
+                break
+            if message.get("role") == "assistant" and message.get("tool_calls"):
+                rounds += 1
+        if rounds >= len(self.tool_rounds):
+            return []
+        return [
+            {
+                "id": f"call_{self.requests}_{i}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }
+            for i, (name, arguments) in enumerate(self.tool_rounds[rounds])
+        ]
+
+    def usage(self, body):
+        # Rough token estimate (4 characters per token) so callers can track prompt growth
+        prompt_chars = sum(len(message.get("content") or "") for message in body.get("messages", []))
+        return {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(self.reply) // 4,
+                "total_tokens": (prompt_chars + len(self.reply)) // 4}
+
+    def completion(self, body):
+        tool_calls = self.planned_tool_calls(body)
+        message = {"role": "assistant", "content": None if tool_calls else self.reply}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        return {
+            "id": f"chatcmpl-stub-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+            "usage": self.usage(body),
+        }
+
+    def completion_chunks(self, body):
+        # Streams the reply word by word, like a model emitting tokens; tool calls are
+        # sent one call per chunk
+        def chunk(delta, finish_reason=None):
+            return {
+                "id": f"chatcmpl-stub-{self.requests}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        tool_calls = self.planned_tool_calls(body)
+        if tool_calls:
+            for i, call in enumerate(tool_calls):
+                yield chunk({"role": "assistant", "tool_calls": [{"index": i, **call}]})
+            yield chunk({}, "tool_calls")
+            return
+
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            yield chunk({"role": "assistant", "content": word if i == 0 else " " + word})
+        yield chunk({}, "stop")
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                stub.requests += 1
+                stub.prompt_log.append((bool(body.get("tools")), stub.usage(body)["prompt_tokens"]))
+                if body.get("stream"):
+                    self._stream(body)
+                    return
+                time.sleep(stub.delay)
+                payload = json.dumps(stub.completion(body)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body):
+                chunks = list(stub.completion_chunks(body))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for chunk in chunks:
+                    time.sleep(stub.delay / len(chunks))
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.5)
+    args = parser.parse_args(argv)
+    server = StubOpenAIServer(port=args.port, delay=args.delay).start()
+    print(f"Stub OpenAI server listening on {server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
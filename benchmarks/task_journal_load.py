@@ -0,0 +1,46 @@
+"""Time writing and reloading a TaskJournal snapshot.
+
+Usage: python benchmarks/task_journal_load.py [--tasks 1000000] [--compact]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from journal import TaskJournal
+from main import CompactTaskManager, TaskManager
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--compact", action="store_true")
+    args = parser.parse_args(argv)
+    manager_cls = CompactTaskManager if args.compact else TaskManager
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = manager_cls(TaskJournal(data_dir, snapshot_every=0))
+        manager.journal.load(manager)
+        manager._restore((i, f"Task {i}", "", i % 3 == 0) for i in range(1, args.tasks + 1))
+
+        started = time.perf_counter()
+        manager.journal.compact()
+        write_s = time.perf_counter() - started
+        manager.journal.close()
+        size_mib = os.path.getsize(manager.journal.snapshot_path) / 2**20
+
+        started = time.perf_counter()
+        reloaded = manager_cls(TaskJournal(data_dir))
+        reloaded.journal.load(reloaded)
+        load_s = time.perf_counter() - started
+        reloaded.journal.close()
+
+    print(f"{manager_cls.__name__}: {args.tasks} tasks, snapshot {size_mib:.1f} MiB, "
+          f"write {write_s:.2f}s, load {load_s:.2f}s ({args.tasks / load_s:,.0f} tasks/s)")
+
+
+if __name__ == "__main__":
+    main()
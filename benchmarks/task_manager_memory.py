@@ -0,0 +1,44 @@
+"""Compare TaskManager memory use for the dict-of-objects and compact layouts.
+
+Usage: python benchmarks/task_manager_memory.py [--tasks 1000000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from main import CompactTaskManager, TaskManager
+
+
+def measure(manager_cls, count):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    manager = manager_cls()
+    for i in range(count):
+        manager.add_task(f"Task {i}", "")
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del manager
+    return current, peak, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    print(f"{'layout':<12} {'tasks':>10} {'MiB':>10} {'peak MiB':>10} {'bytes/task':>11} {'load s':>8}")
+    for name, manager_cls in (("dict", TaskManager), ("compact", CompactTaskManager)):
+        current, peak, elapsed = measure(manager_cls, args.tasks)
+        print(f"{name:<12} {args.tasks:>10} {current / 2**20:>10.1f} {peak / 2**20:>10.1f} "
+              f"{current / args.tasks:>11.0f} {elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Rows per second through each way the task routes have serialized a list.
+
+No database or HTTP: the same synthetic rows go through each path in memory.
+
+  response_model=List[Task]  ORM objects validated into the response model, dumped
+                             to JSON-ready dicts, then json.dumps. This is what FastAPI
+                             did for the original read_tasks.
+  jsonable_encoder           Row dicts returned with response_model=None: FastAPI's
+                             jsonable_encoder walk, then json.dumps.
+  FastJSONResponse           Row dicts handed straight to the orjson-backed response
+                             class (json fallback when orjson isn't installed).
+  streamed array             The same dumps, in 1000-row chunks as GET /api/tasks/export
+                             sends them.
+
+Usage:
+  python benchmarks/task_serialization.py [--rows 10000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import List
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5, help="best of N timings per path")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.TemporaryDirectory() # Never queried; importing the backend just needs a URL
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from models import Task
+    from responses import FastJSONResponse, json_array_chunks, orjson
+    from services.tasks import TASK_FIELDS, TASK_READ_FIELDS
+
+    now = datetime.now(timezone.utc)
+    tasks = [
+        Task(id=i, user_id="bench_user", title=f"Task {i}", description="Something to do " * 3,
+             completed=i % 3 == 0, created_at=now, updated_at=now)
+        for i in range(args.rows)
+    ]
+    full_rows = [{name: getattr(task, name) for name in TASK_FIELDS} for task in tasks]
+    read_rows = [{name: row[name] for name in TASK_READ_FIELDS} for row in full_rows]
+    response_model = TypeAdapter(List[Task])
+
+    def via_response_model():
+        validated = response_model.validate_python(tasks, from_attributes=True)
+        return json.dumps(response_model.dump_python(validated, mode="json")).encode()
+
+    def via_jsonable_encoder():
+        return json.dumps(jsonable_encoder(full_rows)).encode()
+
+    def via_fast_response():
+        return FastJSONResponse(read_rows).body
+
+    loop = asyncio.new_event_loop() # Reused so loop setup isn't timed
+
+    def via_stream():
+        async def batches():
+            for start in range(0, len(read_rows), 1000):
+                yield read_rows[start:start + 1000]
+
+        async def collect():
+            return b"".join([chunk async for chunk in json_array_chunks(batches())])
+        return loop.run_until_complete(collect())
+
+    paths = [
+        ("response_model=List[Task]", via_response_model),
+        ("jsonable_encoder", via_jsonable_encoder),
+        ("FastJSONResponse", via_fast_response),
+        ("streamed array", via_stream),
+    ]
+    print(f"{args.rows} rows, best of {args.repeat}; encoder: {'orjson ' + orjson.__version__ if orjson else 'json'}")
+    print(f"{'path':<26} {'rows/s':>12} {'ms':>8} {'bytes':>10}")
+    baseline = None
+    for name, serialize in paths:
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            body = serialize()
+            best = min(best, time.perf_counter() - started)
+        assert isinstance(json.loads(body), list)
+        baseline = baseline or best
+        print(f"{name:<26} {args.rows / best:>12,.0f} {best * 1000:>8.1f} {len(body):>10,}  ({baseline / best:.1f}x)")
+    loop.close()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 "use client";
 
 import { useState, useEffect, FormEvent } from 'react';
-import { Task, getTasks, createTask, deleteTask, markTaskComplete } from '@/lib/api';
+import { Task, TaskChange, getTasks, createTask, deleteTask, markTaskComplete, subscribeTaskChanges } from '@/lib/api';
 
 import Chat from '@/components/Chat'; // Import the new Chat component
 
@@ -18,17 +18,42 @@ export default function HomePage() {
     }
   };
 
+  // Keeps the list in step with the server: a reset reloads it, changes are applied in place.
+  // Pending tasks come first, matching the order GET /api/tasks/ returns them in. Both are
+  // idempotent, so a change seen in a write's response and again on the feed is harmless.
+  const applyTask = (changed: Task) => {
+    setTasks((current) =>
+      [...current.filter((task) => task.id !== changed.id), changed]
+        .sort((a, b) => Number(a.completed) - Number(b.completed) || a.id - b.id)
+    );
+  };
+
+  const removeTask = (taskId: number) => {
+    setTasks((current) => current.filter((task) => task.id !== taskId));
+  };
+
+  const applyChange = (change: TaskChange) => {
+    if (change.op === 'deleted') {
+      removeTask(change.id);
+    } else {
+      applyTask(change.task);
+    }
+  };
+
   useEffect(() => {
+    // Load straight away even if the feed can't connect; its opening reset then revalidates (usually a 304)
     fetchTasks();
+    return subscribeTaskChanges({ onChange: applyChange, onReset: fetchTasks });
   }, []);
 
   const handleAddTask = async (e: FormEvent) => {
     e.preventDefault();
     if (!newTaskTitle.trim()) return;
     try {
-      await createTask({ title: newTaskTitle });
+      // Applied from the response too: the feed misses it while reconnecting, or when another
+      // backend worker handled the write
+      applyTask(await createTask({ title: newTaskTitle }));
       setNewTaskTitle('');
-      fetchTasks(); // Refetch tasks to show the new one
     } catch (error) {
       console.error('Error creating task:', error);
     }
@@ -36,8 +61,7 @@ export default function HomePage() {
 
   const handleToggleComplete = async (taskId: number) => {
     try {
-      await markTaskComplete(taskId);
-      fetchTasks(); // Refetch tasks to update the status
+      applyTask(await markTaskComplete(taskId));
     } catch (error) {
       console.error('Error toggling task completion:', error);
     }
@@ -46,7 +70,7 @@ export default function HomePage() {
   const handleDeleteTask = async (taskId: number) => {
     try {
       await deleteTask(taskId);
-      fetchTasks(); // Refetch tasks to remove the deleted one
+      removeTask(taskId);
     } catch (error) {
       console.error('Error deleting task:', error);
     }
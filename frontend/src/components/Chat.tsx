@@ -1,7 +1,7 @@
 "use client";
 
 import { useState, FormEvent } from 'react';
-import { sendChatMessage } from '@/lib/api'; // Import the new function
+import { streamChatMessage } from '@/lib/api';
 
 // Define message type for the chat
 interface ChatMessage {
@@ -13,24 +13,37 @@ export default function Chat() {
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [inputMessage, setInputMessage] = useState('');
   const [conversationId, setConversationId] = useState<number | null>(null);
+  const [toolStatus, setToolStatus] = useState<string | null>(null);
 
   const handleSendMessage = async (e: FormEvent) => {
     e.preventDefault();
     if (!inputMessage.trim()) return;
 
     const userMessage: ChatMessage = { role: 'user', content: inputMessage };
-    setMessages(prev => [...prev, userMessage]);
+    // Add an empty assistant bubble that fills in as tokens stream back
+    setMessages(prev => [...prev, userMessage, { role: 'assistant', content: '' }]);
     setInputMessage('');
 
+    const updateAssistantMessage = (update: (content: string) => string) => {
+      setMessages(prev => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, content: update(last.content) }];
+      });
+    };
+
     try {
-      const response = await sendChatMessage(inputMessage, conversationId);
-      const assistantMessage: ChatMessage = { role: 'assistant', content: response.response };
-      setMessages(prev => [...prev, assistantMessage]);
+      const response = await streamChatMessage(inputMessage, conversationId, {
+        onToken: token => updateAssistantMessage(content => content + token),
+        onToolCall: name => setToolStatus(`Running ${name}...`),
+        onToolResult: () => setToolStatus(null),
+      });
+      updateAssistantMessage(() => response.response);
       setConversationId(response.conversation_id);
     } catch (error) {
       console.error("Failed to send message:", error);
-      const errorMessage: ChatMessage = { role: 'assistant', content: "Sorry, I couldn't get a response from the AI." };
-      setMessages(prev => [...prev, errorMessage]);
+      updateAssistantMessage(() => "Sorry, I couldn't get a response from the AI.");
+    } finally {
+      setToolStatus(null);
     }
   };
 
@@ -47,6 +60,9 @@ export default function Chat() {
             </div>
           </div>
         ))}
+        {toolStatus && (
+          <div className="text-sm text-gray-400 italic">{toolStatus}</div>
+        )}
          {messages.length === 0 && (
             <div className="text-center text-gray-500">
                 <p>Ask me to add, list, or complete tasks!</p>
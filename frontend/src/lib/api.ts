@@ -3,7 +3,7 @@ const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:8000/api';
 // Define the Task type to match the backend model
 export interface Task {
   id: number;
-  user_id: string;
+  user_id?: string; // Only on write responses; reads omit the owner
   title: string;
   description: string | null;
   completed: boolean;
@@ -11,8 +11,32 @@ export interface Task {
   updated_at: string;
 }
 
+export interface TaskPage {
+  tasks: Task[];
+  nextCursor: string | null;
+}
+
+// One page of tasks, pending first; pass nextCursor back to get the following page
+export const getTasksPage = async (
+  status: 'all' | 'pending' | 'completed' = 'all',
+  cursor: string | null = null,
+  limit = 100,
+): Promise<TaskPage> => {
+  const params = new URLSearchParams({ status_filter: status, limit: String(limit) });
+  if (cursor) {
+    params.set('cursor', cursor);
+  }
+  // no-cache: reuse the browser's copy, but revalidate it with If-None-Match (a 304 when nothing changed)
+  const response = await fetch(`${API_URL}/tasks/?${params}`, { cache: 'no-cache' });
+  if (!response.ok) {
+    throw new Error('Failed to fetch tasks');
+  }
+  return { tasks: await response.json(), nextCursor: response.headers.get('X-Next-Cursor') };
+};
+
+// Every task in one streamed response; revalidated with If-None-Match like the pages
 export const getTasks = async (status: 'all' | 'pending' | 'completed' = 'all'): Promise<Task[]> => {
-  const response = await fetch(`${API_URL}/tasks/?status_filter=${status}`);
+  const response = await fetch(`${API_URL}/tasks/export?status_filter=${status}`, { cache: 'no-cache' });
   if (!response.ok) {
     throw new Error('Failed to fetch tasks');
   }
@@ -81,4 +105,119 @@ export const sendChatMessage = async (message: string, conversationId: number |
     throw new Error('Failed to send chat message');
   }
   return response.json();
-};
\ No newline at end of file
+};
+
+export interface ChatStreamHandlers {
+  onToken: (content: string) => void;
+  onToolCall?: (name: string) => void;
+  onToolResult?: (name: string, result: unknown) => void;
+}
+
+// Streams a chat reply from the server-sent events endpoint. Resolves with the
+// final response once the backend has stored the assistant message.
+export const streamChatMessage = async (
+  message: string,
+  conversationId: number | null,
+  handlers: ChatStreamHandlers,
+): Promise<{ response: string; conversation_id: number }> => {
+  const response = await fetch(`${API_URL}/chat/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+    },
+    body: JSON.stringify({ message, conversation_id: conversationId }),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error('Failed to send chat message');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line; keep any trailing partial event in the buffer
+    const events = buffer.split('\n\n');
+    buffer = events.pop() ?? '';
+    for (const raw of events) {
+      const dataLine = raw.split('\n').find(line => line.startsWith('data: '));
+      if (!dataLine) continue;
+      const event = JSON.parse(dataLine.slice('data: '.length));
+      switch (event.type) {
+        case 'token':
+          handlers.onToken(event.content);
+          break;
+        case 'tool_call':
+          handlers.onToolCall?.(event.name);
+          break;
+        case 'tool_result':
+          handlers.onToolResult?.(event.name, event.result);
+          break;
+        case 'done':
+          return { response: event.response, conversation_id: event.conversation_id };
+        case 'error':
+          throw new Error(event.detail);
+      }
+    }
+  }
+  throw new Error('Chat stream ended unexpectedly');
+};
+
+export type TaskChange =
+  | { type: 'change'; seq: number; op: 'created' | 'updated'; task: Task }
+  | { type: 'change'; seq: number; op: 'deleted'; id: number };
+
+export interface TaskFeedHandlers {
+  onChange: (change: TaskChange) => void;
+  // Changes were missed (first connect, restart, or too far behind): reload the list
+  onReset: () => void;
+}
+
+// Follows the server's task change feed, reconnecting and resuming from the last applied
+// change when the socket drops. Returns a function that closes it for good.
+export const subscribeTaskChanges = (handlers: TaskFeedHandlers): (() => void) => {
+  const feedUrl = `${API_URL.replace(/^http/, 'ws')}/tasks/feed`;
+  let socket: WebSocket | null = null;
+  let epoch: string | null = null;
+  let seq: number | null = null;
+  let closed = false;
+  let retryTimer: ReturnType<typeof setTimeout> | undefined;
+
+  const connect = () => {
+    const params = new URLSearchParams();
+    if (epoch !== null && seq !== null) {
+      params.set('epoch', epoch);
+      params.set('since', String(seq));
+    }
+    socket = new WebSocket(`${feedUrl}?${params}`);
+    socket.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      if (event.type === 'hello') {
+        epoch = event.epoch;
+        return;
+      }
+      seq = event.seq;
+      if (event.type === 'reset') {
+        handlers.onReset();
+      } else if (event.type === 'change') {
+        handlers.onChange(event as TaskChange);
+      }
+    };
+    socket.onclose = () => {
+      if (!closed) {
+        retryTimer = setTimeout(connect, 2000);
+      }
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    socket?.close();
+  };
+};
@@ -0,0 +1,136 @@
+import json
+import mmap
+import os
+import struct
+import uuid
+
+SNAPSHOT_MAGIC = b"TODOSNP1"
+# magic, last journal sequence number folded into the snapshot, record count
+SNAPSHOT_HEADER = struct.Struct("<8sQQ")
+# task id (128-bit, big endian), completed, title length, description length
+SNAPSHOT_RECORD = struct.Struct("<16sBII")
+
+class TaskJournal:
+    # Append-only operation log (add/update/delete/complete) plus a compacted binary
+    # snapshot. Startup maps the snapshot into memory and decodes fixed-size record
+    # headers in place, then replays only the log entries written after it.
+    def __init__(self, data_dir, snapshot_every=10000, fsync=False):
+        self.data_dir = data_dir
+        self.snapshot_path = os.path.join(data_dir, "snapshot.bin")
+        self.log_path = os.path.join(data_dir, "journal.log")
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.manager = None
+        self.seq = 0
+        self._ops_since_snapshot = 0
+        self._log = None
+
+    def load(self, manager):
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.manager = manager
+        self.seq = self._load_snapshot(manager)
+        self._replay_log(manager)
+        self._log = open(self.log_path, "a", encoding="utf-8")
+
+    def append(self, op, id_int, **fields):
+        self.seq += 1
+        entry = {"seq": self.seq, "op": op, "id": f"{id_int:032x}", **fields}
+        self._log.write(json.dumps(entry) + "\n")
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+
+        self._ops_since_snapshot += 1
+        if self.snapshot_every and self._ops_since_snapshot >= self.snapshot_every:
+            self.compact()
+
+    def compact(self):
+        manager = self.manager
+        tmp_path = self.snapshot_path + ".tmp"
+        tasks = list(manager._iter_tasks("all"))
+        with open(tmp_path, "wb", buffering=1 << 20) as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.seq, len(tasks)))
+            for task in tasks:
+                title = task.title.encode("utf-8")
+                description = (task.description or "").encode("utf-8")
+                f.write(SNAPSHOT_RECORD.pack(task.id_int.to_bytes(16, "big"), manager._is_completed(task),
+                                             len(title), len(description)))
+                f.write(title)
+                f.write(description)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # Everything up to self.seq is now in the snapshot. If we crash before the log is
+        # truncated, replay skips those entries by sequence number.
+        self._log.close()
+        self._log = open(self.log_path, "w", encoding="utf-8")
+        self._ops_since_snapshot = 0
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _load_snapshot(self, manager):
+        if not os.path.exists(self.snapshot_path) or os.path.getsize(self.snapshot_path) == 0:
+            return 0
+        with open(self.snapshot_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, seq, count = SNAPSHOT_HEADER.unpack_from(data, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{self.snapshot_path} is not a task snapshot.")
+            manager._restore(self._iter_snapshot_records(data, count))
+        return seq
+
+    def _iter_snapshot_records(self, data, count):
+        unpack_from = SNAPSHOT_RECORD.unpack_from
+        record_size = SNAPSHOT_RECORD.size
+        offset = SNAPSHOT_HEADER.size
+        for _ in range(count):
+            raw_id, completed, title_len, description_len = unpack_from(data, offset)
+            offset += record_size
+            title = data[offset:offset + title_len].decode("utf-8")
+            offset += title_len
+            description = data[offset:offset + description_len].decode("utf-8")
+            offset += description_len
+            yield int.from_bytes(raw_id, "big"), title, description, bool(completed)
+
+    def _replay_log(self, manager):
+        if not os.path.exists(self.log_path):
+            return
+        snapshot_seq = self.seq
+        offset = 0
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete entry")
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn final write from a crash; drop it so new entries start on a clean line
+                    break
+                offset += len(line)
+                if entry["seq"] <= snapshot_seq:
+                    continue
+                self._apply(manager, entry)
+                self.seq = entry["seq"]
+                self._ops_since_snapshot += 1
+        if offset != os.path.getsize(self.log_path):
+            os.truncate(self.log_path, offset)
+
+    def _apply(self, manager, entry):
+        id_int = int(entry["id"], 16)
+        if entry["op"] == "add":
+            manager._restore([(id_int, entry["title"], entry["description"], False)])
+            return
+
+        task, error = manager._find_task_by_prefix(str(uuid.UUID(int=id_int)))
+        if error:
+            return
+        if entry["op"] == "update":
+            task.title = entry["title"]
+            task.description = entry["description"]
+        elif entry["op"] == "delete":
+            manager._remove(task)
+        elif entry["op"] == "complete":
+            manager._set_completed(task, entry["completed"])
@@ -1,75 +1,356 @@
+import argparse
+import string
 import uuid
+from bisect import bisect_left, insort
+from itertools import islice
+
+from journal import TaskJournal
+
+def format_task(short_id, title, completed):
+    status = "Completed" if completed else "Pending"
+    return f"ID: {short_id}... | Title: {title} | Status: {status}"
 
 class Task:
-    def __init__(self, title, description=""):
-        self.id = str(uuid.uuid4())
+    def __init__(self, title, description="", task_id=None):
+        self.id = task_id or str(uuid.uuid4())
         self.title = title
         self.description = description
         self.completed = False
 
+    @property
+    def short_id(self):
+        return self.id[:8]
+
+    @property
+    def id_int(self):
+        return uuid.UUID(self.id).int
+
     def __repr__(self):
-        status = "Completed" if self.completed else "Pending"
-        return f"ID: {self.id[:8]}... | Title: {self.title} | Status: {status}"
+        return format_task(self.short_id, self.title, self.completed)
+
+class CompactTask:
+    # Slot-only task for CompactTaskManager. `key` packs the 128-bit integer ID with the
+    # storage row (id << 32 | row) and is the same int object the ID index holds.
+    # Completion state is not stored here; it lives in the manager's bitset at `row`.
+    __slots__ = ("key", "title", "description")
+    ROW_BITS = 32
+
+    def __init__(self, key, title, description):
+        self.key = key
+        self.title = title
+        self.description = description
+
+    @property
+    def id(self):
+        return self.key >> self.ROW_BITS
+
+    @property
+    def id_int(self):
+        return self.id
+
+    @property
+    def row(self):
+        return self.key & ((1 << self.ROW_BITS) - 1)
+
+    @property
+    def short_id(self):
+        return f"{self.id:032x}"[:8]
+
+class TaskIndex:
+    # Sorted task IDs split into small buckets, so inserts and prefix lookups stay
+    # logarithmic instead of shifting one huge list on every add/delete.
+    BUCKET_SIZE = 512
 
-class TaskManager:
     def __init__(self):
+        self._buckets = []
+        self._maxes = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def add(self, task_id):
+        if not self._buckets:
+            self._buckets.append([task_id])
+            self._maxes.append(task_id)
+            self._len += 1
+            return
+
+        pos = bisect_left(self._maxes, task_id)
+        if pos == len(self._maxes):
+            pos -= 1
+            self._buckets[pos].append(task_id)
+            self._maxes[pos] = task_id
+        else:
+            insort(self._buckets[pos], task_id)
+        self._len += 1
+
+        bucket = self._buckets[pos]
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            upper = bucket[self.BUCKET_SIZE:]
+            del bucket[self.BUCKET_SIZE:]
+            self._buckets.insert(pos + 1, upper)
+            self._maxes[pos] = bucket[-1]
+            self._maxes.insert(pos + 1, upper[-1])
+
+    def extend(self, task_ids):
+        # Bulk load (journal replay): rebuild the buckets from one sort unless the batch is small
+        task_ids = list(task_ids)
+        if len(task_ids) * 16 < self._len:
+            for task_id in task_ids:
+                self.add(task_id)
+            return
+        merged = sorted([task_id for bucket in self._buckets for task_id in bucket] + task_ids)
+        self._buckets = [merged[i:i + self.BUCKET_SIZE] for i in range(0, len(merged), self.BUCKET_SIZE)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(merged)
+
+    def remove(self, task_id):
+        pos = bisect_left(self._maxes, task_id)
+        if pos == len(self._maxes):
+            return
+        bucket = self._buckets[pos]
+        i = bisect_left(bucket, task_id)
+        if i == len(bucket) or bucket[i] != task_id:
+            return
+
+        del bucket[i]
+        self._len -= 1
+        if not bucket:
+            del self._buckets[pos]
+            del self._maxes[pos]
+        elif i == len(bucket):
+            self._maxes[pos] = bucket[-1]
+
+    def match(self, prefix, limit=2):
+        return self._scan(prefix, lambda task_id: task_id.startswith(prefix), limit)
+
+    def _scan(self, start, accept, limit):
+        # Matching IDs are contiguous from `start`, so stop at the first miss or at `limit` hits.
+        matches = []
+        pos = bisect_left(self._maxes, start)
+        while pos < len(self._buckets):
+            bucket = self._buckets[pos]
+            i = bisect_left(bucket, start)
+            while i < len(bucket):
+                if len(matches) == limit or not accept(bucket[i]):
+                    return matches
+                matches.append(bucket[i])
+                i += 1
+            pos += 1
+        return matches
+
+class CompactTaskIndex(TaskIndex):
+    # Keys are CompactTask.key values, so entries sort by task ID and carry their storage
+    # row without a separate id -> row dict. A hex prefix becomes a contiguous key range.
+    def match(self, prefix, limit=2):
+        digits = prefix.replace("-", "").lower()
+        if len(digits) > 32 or any(c not in string.hexdigits for c in digits):
+            return []
+        shift = 4 * (32 - len(digits)) + CompactTask.ROW_BITS
+        low = int(digits, 16) << shift if digits else 0
+        high = low + (1 << shift)
+        return self._scan(low, lambda key: key < high, limit)
+
+class TaskManager:
+    def __init__(self, journal=None):
+        self.journal = journal
         self.tasks = {}
+        self.index = TaskIndex()
+        # Status partitions (insertion-ordered dicts used as sets) so filtered views
+        # only touch the tasks they return.
+        self.pending = {}
+        self.completed = {}
 
     def add_task(self, title, description=""):
         if not title:
             return "Task title cannot be empty."
-        task = Task(title, description)
-        self.tasks[task.id] = task
-        return f"Task '{task.title}' added with ID: {task.id[:8]}..."
+        task = self._insert(title, description)
+        self._log("add", task, title=task.title, description=task.description)
+        return f"Task '{task.title}' added with ID: {task.short_id}..."
 
     def view_tasks(self, status="all"):
-        filtered_tasks = []
-        for task_id in self.tasks:
-            task = self.tasks[task_id]
-            if status == "all" or \
-               (status == "pending" and not task.completed) or \
-               (status == "completed" and task.completed):
-                filtered_tasks.append(task)
-
-        if not filtered_tasks:
-            return "No tasks found."
-        
-        return "\n".join([str(task) for task in filtered_tasks])
+        rows = "\n".join(self.iter_task_rows(status))
+        return rows or "No tasks found."
+
+    def iter_task_rows(self, status="all"):
+        # Streams formatted rows; cost is proportional to the tasks in `status`, not all tasks
+        for task in self._iter_tasks(status):
+            yield self._format(task)
+
+    def view_tasks_page(self, status="all", page=1, page_size=20):
+        start = (max(page, 1) - 1) * page_size
+        rows = list(islice(self.iter_task_rows(status), start, start + page_size))
+        return "\n".join(rows) or "No tasks found."
 
     def update_task(self, task_id_prefix, new_title=None, new_description=None):
-        task = self._find_task_by_prefix(task_id_prefix)
-        if not task:
-            return f"Task with ID prefix '{task_id_prefix}' not found."
+        task, error = self._find_task_by_prefix(task_id_prefix)
+        if error:
+            return error
 
         if new_title:
             task.title = new_title
         if new_description is not None: # Allow empty string to clear description
             task.description = new_description
-        return f"Task '{task.title}' (ID: {task.id[:8]}...) updated."
+        self._log("update", task, title=task.title, description=task.description)
+        return f"Task '{task.title}' (ID: {task.short_id}...) updated."
 
     def delete_task(self, task_id_prefix):
-        task = self._find_task_by_prefix(task_id_prefix)
-        if not task:
-            return f"Task with ID prefix '{task_id_prefix}' not found."
+        task, error = self._find_task_by_prefix(task_id_prefix)
+        if error:
+            return error
         
-        del self.tasks[task.id]
-        return f"Task '{task.title}' (ID: {task.id[:8]}...) deleted."
+        self._remove(task)
+        self._log("delete", task)
+        return f"Task '{task.title}' (ID: {task.short_id}...) deleted."
 
     def mark_task_complete(self, task_id_prefix, complete=True):
-        task = self._find_task_by_prefix(task_id_prefix)
-        if not task:
-            return f"Task with ID prefix '{task_id_prefix}' not found."
+        task, error = self._find_task_by_prefix(task_id_prefix)
+        if error:
+            return error
         
-        task.completed = complete
+        self._set_completed(task, complete)
+        self._log("complete", task, completed=complete)
         status = "completed" if complete else "pending"
-        return f"Task '{task.title}' (ID: {task.id[:8]}...) marked as {status}."
+        return f"Task '{task.title}' (ID: {task.short_id}...) marked as {status}."
 
     def _find_task_by_prefix(self, task_id_prefix):
-        # Find task by partial ID match
-        for task_id, task in self.tasks.items():
-            if task_id.startswith(task_id_prefix):
-                return task
-        return None
+        # Find task by partial ID match. Returns (task, None) on a unique match, otherwise (None, error message)
+        matches = self.index.match(task_id_prefix)
+        if not matches:
+            return None, f"Task with ID prefix '{task_id_prefix}' not found."
+        if len(matches) > 1:
+            return None, f"Task ID prefix '{task_id_prefix}' is ambiguous. Please enter more characters."
+        return self._lookup(matches[0]), None
+
+    def _log(self, op, task, **fields):
+        if self.journal is not None:
+            self.journal.append(op, task.id_int, **fields)
+
+    # Storage hooks; CompactTaskManager overrides these and inherits the public methods.
+
+    def _insert(self, title, description):
+        task = self._place(uuid.uuid4().int, title, description, False)
+        self.index.add(task.id)
+        return task
+
+    def _restore(self, records):
+        # Loads (id_int, title, description, completed) records without journaling them
+        tasks = [self._place(*record) for record in records]
+        self.index.extend(task.id for task in tasks)
+
+    def _place(self, id_int, title, description, completed):
+        h = f"{id_int:032x}"
+        task = Task(title, description, task_id=f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}")
+        task.completed = completed
+        self.tasks[task.id] = task
+        (self.completed if completed else self.pending)[task.id] = task
+        return task
+
+    def _remove(self, task):
+        del self.tasks[task.id]
+        (self.completed if task.completed else self.pending).pop(task.id)
+        self.index.remove(task.id)
+
+    def _lookup(self, key):
+        return self.tasks[key]
+
+    def _iter_tasks(self, status="all"):
+        if status == "pending":
+            return iter(self.pending.values())
+        if status == "completed":
+            return iter(self.completed.values())
+        if status == "all":
+            return iter(self.tasks.values())
+        return iter(())
+
+    def _is_completed(self, task):
+        return task.completed
+
+    def _set_completed(self, task, complete):
+        if task.completed == complete:
+            return
+        source, target = (self.pending, self.completed) if complete else (self.completed, self.pending)
+        del source[task.id]
+        target[task.id] = task
+        task.completed = complete
+
+    def _format(self, task):
+        return str(task)
+
+class CompactTaskManager(TaskManager):
+    # Same public methods as TaskManager, stored column-style for large task sets:
+    # slot-only tasks in a row list, 128-bit integer IDs and a bitset for `completed`.
+    def __init__(self, journal=None):
+        self.journal = journal
+        self.rows = []
+        self.index = CompactTaskIndex()
+        self._free_rows = []
+        self._completed = bytearray()
+
+    def _insert(self, title, description):
+        task = self._place(uuid.uuid4().int, title, description, False)
+        self.index.add(task.key)
+        return task
+
+    def _restore(self, records):
+        tasks = [self._place(*record) for record in records]
+        self.index.extend(task.key for task in tasks)
+
+    def _place(self, id_int, title, description, completed):
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = len(self.rows)
+            self.rows.append(None)
+            if row >> 3 == len(self._completed):
+                self._completed.append(0)
+        task = CompactTask((id_int << CompactTask.ROW_BITS) | row, title, description)
+        self.rows[row] = task
+        self._set_completed(task, completed)
+        return task
+
+    def _remove(self, task):
+        self.index.remove(task.key)
+        self._set_completed(task, False)
+        self.rows[task.row] = None
+        self._free_rows.append(task.row)
+
+    def _lookup(self, key):
+        return self.rows[key & ((1 << CompactTask.ROW_BITS) - 1)]
+
+    def _iter_tasks(self, status="all"):
+        if status == "all":
+            return (task for task in self.rows if task is not None)
+        if status in ("pending", "completed"):
+            return self._iter_bitset(status == "completed")
+        return iter(())
+
+    def _iter_bitset(self, completed):
+        # Walks the bitset a byte at a time, skipping bytes that hold no row in the
+        # requested state, so sparse partitions cost far less than a row scan.
+        skip = 0 if completed else 0xFF
+        for byte_index, byte in enumerate(self._completed):
+            if byte == skip:
+                continue
+            base = byte_index << 3
+            for bit in range(8):
+                if bool(byte & (1 << bit)) == completed and base + bit < len(self.rows):
+                    task = self.rows[base + bit]
+                    if task is not None:
+                        yield task
+
+    def _is_completed(self, task):
+        return bool(self._completed[task.row >> 3] & (1 << (task.row & 7)))
+
+    def _set_completed(self, task, complete):
+        if complete:
+            self._completed[task.row >> 3] |= 1 << (task.row & 7)
+        else:
+            self._completed[task.row >> 3] &= ~(1 << (task.row & 7)) & 0xFF
+
+    def _format(self, task):
+        return format_task(task.short_id, task.title, self._is_completed(task))
 
 def display_menu():
     print("\n--- Todo App Menu ---")
@@ -82,8 +363,16 @@ def display_menu():
     print("7. Exit")
     print("---------------------")
 
-def main():
-    manager = TaskManager()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Todo console app")
+    parser.add_argument("--compact", action="store_true", help="use the compact storage layout for large task sets")
+    parser.add_argument("--data-dir", help="persist tasks to an append-only journal in this directory")
+    args = parser.parse_args(argv)
+
+    manager = CompactTaskManager() if args.compact else TaskManager()
+    if args.data_dir:
+        manager.journal = TaskJournal(args.data_dir)
+        manager.journal.load(manager)
 
     while True:
         display_menu()
@@ -95,7 +384,12 @@ def main():
             print(manager.add_task(title, description))
         elif choice == '2':
             status_filter = input("View (all/pending/completed)? [all]: ").lower() or "all"
-            print(manager.view_tasks(status_filter))
+            found = False
+            for row in manager.iter_task_rows(status_filter):
+                print(row)
+                found = True
+            if not found:
+                print("No tasks found.")
         elif choice == '3':
             task_id_prefix = input("Enter task ID prefix to update: ")
             new_title = input("Enter new title (leave blank to keep current): ")
@@ -117,6 +411,8 @@ def main():
             print(manager.mark_task_complete(task_id_prefix, complete=False))
         elif choice == '7':
             print("Exiting Todo App. Goodbye!")
+            if manager.journal is not None:
+                manager.journal.close()
             break
         else:
             print("Invalid choice. Please try again.")